@@ -1,13 +1,29 @@
 # app.py
 import os
 import json
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from urllib.parse import urlencode
+from flask import Flask, Response, render_template, request, redirect, url_for, flash, session, jsonify, g
+from markupsafe import escape
 import pandas as pd
 from werkzeug.utils import secure_filename
 from datetime import datetime
-from data_processor import process_lixingren_csv, save_processed_data
+from data_processor import get_advice_column
 from utils import extract_date_from_filename, get_latest_data_date, check_password
-from index_categories import get_index_category, is_industry_index
+import numpy as np
+from index_categories import classify_indices
+from temperature_models import DEFAULT_MODEL, resolve_model
+from ingest_watcher import UploadWatcher, ingest_file, warm_up
+from compression import PageCache, CachedPage, compress_response, negotiate_encoding
+from events import snapshot_events, format_sse
+from export import EXPORT_FORMATS, parse_date, list_processed_files, export_columns, stream_export, gzip_stream
+from profiling import start_profile, finish_profile, get_profiles, get_profile
+from memory_guard import (MemoryTracker, current_rss_mb, plan_ingest, add_pressure_handler, relieve_after_request,
+                          record_request, get_request_samples, MEMORY_BUDGET_MB, RETRY_AFTER_SECONDS)
+from formatting import strip_equals, format_percent, temperature_badges, render_table
+from snapshot import load_snapshot, render_category_summary, normalize_sort, ordered_positions, add_publish_listener
+from snapshot_store import sync_snapshot
+from temperature_matrix import temperature_matrix, encode_json, encode_binary
+from static_export import export_after_publish
 
 # 判断是否在SCF环境
 def is_scf_environment():
@@ -43,9 +59,82 @@ app.config['ALLOWED_EXTENSIONS'] = {'csv'}
 for dir_path in [app.config['UPLOAD_FOLDER'], os.path.join(DATA_DIR, 'processed')]:
     os.makedirs(dir_path, exist_ok=True)
 
+# 启动预热：在处理第一个请求前准备好快照
+warm_up()
+
+# 可选：后台监听上传目录（INGEST_WATCH=1 开启；SCF实例在请求之间会被冻结，不建议开启）
+if os.environ.get('INGEST_WATCH') == '1':
+    upload_watcher = UploadWatcher(app.config['UPLOAD_FOLDER'],
+                                   interval=float(os.environ.get('INGEST_WATCH_INTERVAL', '5')),
+                                   max_workers=int(os.environ.get('INGEST_WATCH_WORKERS', '2'))).start()
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
+# 快照更新事件：SSE心跳间隔、长轮询最长等待（SCF超时为30秒）、最大SSE连接数
+# 每个SSE连接在连接期间占用WSGI服务器的一个线程（空闲时不占CPU，每个约40KB内存，见 bench_events.py），
+# 连接数上限按内存预算设置，超过后返回503，客户端改用长轮询
+EVENT_HEARTBEAT = 15
+LONG_POLL_TIMEOUT = 25
+MAX_EVENT_SUBSCRIBERS = int(os.environ.get('MAX_EVENT_SUBSCRIBERS', '500'))
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# 分页链接中保留的首页参数
+PAGINATION_ARGS = ('page_size', 'sort', 'order', 'model', 'search', 'category', 'summary')
+
+def parse_paging_args(args):
+    """解析 ?sort=&order=&page=&page_size= 参数"""
+    sort, order = normalize_sort(args.get('sort', 'default'), args.get('order', 'desc'))
+    page = args.get('page', 1, type=int) or 1
+    page_size = args.get('page_size', DEFAULT_PAGE_SIZE, type=int) or DEFAULT_PAGE_SIZE
+    return sort, order, max(page, 1), min(max(page_size, 1), MAX_PAGE_SIZE)
+
+def render_pagination(page, page_size, total, args):
+    """生成分页导航，链接只保留首页认识的筛选与排序参数"""
+    pages = max((total + page_size - 1) // page_size, 1)
+    if pages <= 1:
+        return ''
+    params = {k: args[k] for k in PAGINATION_ARGS if k in args}
+    html = '<nav><ul class="pagination">'
+    for target, label in [(page - 1, '上一页')] + [(p, str(p)) for p in range(1, pages + 1)] + [(page + 1, '下一页')]:
+        if target < 1 or target > pages:
+            html += f'<li class="page-item disabled"><span class="page-link">{label}</span></li>'
+        else:
+            active = ' active' if target == page and label == str(page) else ''
+            href = url_for('index') + '?' + urlencode({'page': target, **params})
+            html += f'<li class="page-item{active}"><a class="page-link" href="{href}">{label}</a></li>'
+    html += '</ul></nav>'
+    return html
+
+def visible_rows(snapshot, temperature_column, search_keyword='', category=''):
+    """
+    首页与接口共用的行过滤，返回布尔数组：
+    涨跌幅/关注度有数据（入库时已预计算）、分位点有效、温度不为0，指数名称包含搜索关键词，且属于指定类别
+    """
+    df = snapshot['df']
+    keep = snapshot['sort']['visible'].copy()
+    
+    # 排除PE分位点或PB分位点为空、为'-'或为0的行
+    if 'PE分位点' in df.columns and 'PB分位点' in df.columns:
+        for col in ['PE分位点', 'PB分位点']:
+            quantile = df[col]
+            keep &= quantile.notna().to_numpy()
+            keep &= ~quantile.isin(['-', '0', '0%']).to_numpy()
+            if pd.api.types.is_numeric_dtype(quantile):
+                keep &= (quantile != 0).to_numpy()
+    
+    # 排除计算报错的行（基金温度为0或为空）
+    if temperature_column in df.columns:
+        temperature = pd.to_numeric(df[temperature_column], errors='coerce').round(1)
+        keep &= (temperature.notna() & (temperature != 0)).to_numpy()
+    
+    if search_keyword:
+        keep &= df['指数名称'].str.contains(search_keyword, case=False, na=False, regex=False).to_numpy()
+    if category:
+        keep &= (df['类别'].astype(str) == category).to_numpy() if '类别' in df.columns else False
+    return keep
+
 def login_required(f):
     """装饰器：需要登录才能访问"""
     from functools import wraps
@@ -57,63 +146,107 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# 快照派生页面的渲染/压缩缓存
+page_cache = PageCache()
+# 内存紧张时先丢弃页面缓存，下次请求重新渲染即可
+add_pressure_handler(page_cache.clear)
+
+def snapshot_version():
+    snapshot = load_snapshot()
+    return snapshot['mtime'] if snapshot is not None else None
+
+def version_cached(get_version):
+    """装饰器工厂：按 get_version() 返回的数据版本缓存页面，同一版本只渲染、压缩一次"""
+    from functools import wraps
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            # 有待显示的提示消息或正在做性能分析时不走缓存
+            if session.get('_flashes') or 'profiler' in g:
+                return f(*args, **kwargs)
+            version = get_version()
+            key = (request.full_path, 'logged_in' in session)
+            page = page_cache.get(key, version)
+            if page is None:
+                response = app.make_response(f(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                page = CachedPage(version, response.get_data(), response.mimetype)
+                page_cache.put(key, page)
+            encoding, body = page.variant(negotiate_encoding(request.headers.get('Accept-Encoding', '')))
+            response = app.response_class(body, mimetype=page.mimetype)
+            response.vary.add('Accept-Encoding')
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+            return response
+        return decorated_function
+    return decorator
+
+# 快照派生页面按快照版本缓存
+snapshot_cached = version_cached(snapshot_version)
+
+@app.after_request
+def compress_and_cache(response):
+    """按 Accept-Encoding 压缩响应"""
+    return compress_response(response, request.headers.get('Accept-Encoding', ''))
+
+@app.before_request
+def start_request_profile():
+    """管理员在任意地址后加 ?_profile=1 时分析本次请求；不带参数时没有额外开销"""
+    if request.args.get('_profile') == '1' and session.get('logged_in'):
+        g.profiler, g.profile_started = start_profile()
+
+@app.after_request
+def finish_request_profile(response):
+    """结束分析并把报告编号放在响应头中，报告在 /admin/profiles 查看"""
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profile_id = finish_profile(profiler, g.profile_started, request.method, request.full_path, response.status_code)
+        response.headers['X-Profile-Id'] = str(profile_id)
+    return response
+
+@app.teardown_request
+def stop_request_profile(exc):
+    """请求出错时也要停止分析"""
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        finish_profile(profiler, g.profile_started, request.method, request.full_path, 500)
+
+@app.before_request
+def sync_from_store():
+    """其他实例上传后，按间隔比较存储中的快照版本并拉取（未配置存储时直接返回）"""
+    if request.endpoint != 'static':
+        sync_snapshot()
+
+@app.before_request
+def sample_request_memory():
+    """记录请求开始时的RSS（读取 /proc/self/statm，开销可以忽略）"""
+    g.rss_before = current_rss_mb()
+
+@app.after_request
+def check_request_memory(response):
+    """记录请求前后的RSS；超过预算且本次请求使内存增长时丢弃渲染缓存（有最小间隔）"""
+    rss_before = g.pop('rss_before', None)
+    if rss_before is not None:
+        rss_after = current_rss_mb()
+        record_request(request.method, request.full_path, response.status_code, rss_before, rss_after)
+        relieved = relieve_after_request(rss_before, rss_after)
+        if relieved is not None:
+            print(f"内存 {rss_after:.1f}MB 超过预算，已丢弃渲染缓存，释放后 {relieved:.1f}MB")
+    return response
+
 # ========== 公开页面 ==========
 @app.route('/')
+@snapshot_cached
 def index():
     """首页：公开访问，显示最新温度数据"""
     # 使用DATA_DIR路径
     data_file = os.path.join(DATA_DIR, 'latest_data.csv')
     data_date = get_latest_data_date()
     
-    # 检查文件是否存在且不为空
-    print(f"=== index路由开始 ===")
-    print(f"当前工作目录：{os.getcwd()}")
-    print(f"数据文件路径：{data_file}")
-    print(f"数据文件存在：{os.path.exists(data_file)}")
-    print(f"数据文件大小：{os.path.getsize(data_file) if os.path.exists(data_file) else 0} 字节")
-    
-    if not os.path.exists(data_file) or os.path.getsize(data_file) == 0:
-        print(f"检查到数据文件不存在或为空：{data_file}")
-        # 尝试从uploaded目录找到最新的CSV文件并处理
-        uploaded_dir = app.config['UPLOAD_FOLDER']
-        print(f"上传目录：{uploaded_dir}")
-        print(f"上传目录绝对路径：{os.path.abspath(uploaded_dir)}")
-        
-        if os.path.exists(uploaded_dir):
-            csv_files = [f for f in os.listdir(uploaded_dir) if f.endswith('.csv')]
-            print(f"找到的CSV文件：{csv_files}")
-            
-            if csv_files:
-                # 按文件名排序，最新的日期排在前面
-                csv_files.sort(reverse=True)
-                latest_csv = os.path.join(uploaded_dir, csv_files[0])
-                print(f"最新的CSV文件：{latest_csv}")
-                
-                # 处理数据
-                try:
-                    print(f"开始处理文件：{latest_csv}")
-                    result_df = process_lixingren_csv(latest_csv)
-                    if result_df is not None:
-                        print(f"处理成功，结果数据：{result_df}")
-                        # 保存处理后的数据
-                        result_df.to_csv(data_file, index=False, encoding='utf-8-sig')
-                        print(f"自动处理并更新了数据：{latest_csv}")
-                    else:
-                        print("处理失败，result_df为空")
-                except Exception as e:
-                    print(f"自动处理数据失败：{str(e)}")
-                    import traceback
-                    traceback.print_exc()
-        else:
-            print(f"上传目录不存在：{uploaded_dir}")
-    
-    # 再次检查文件
-    print(f"=== 再次检查文件 ===")
-    print(f"数据文件路径：{data_file}")
-    print(f"数据文件存在：{os.path.exists(data_file)}")
-    print(f"数据文件大小：{os.path.getsize(data_file) if os.path.exists(data_file) else 0} 字节")
-    
-    if not os.path.exists(data_file) or os.path.getsize(data_file) == 0:
+    # 数据处理由上传、后台监听和启动预热完成，这里只读取快照
+    snapshot = load_snapshot()
+    if snapshot is None:
         data_html = """
         <div class="alert alert-warning">
             <h4>📊 基金温度看板</h4>
@@ -124,285 +257,73 @@ def index():
         update_time = "等待数据更新"
     else:
         try:
-            df = pd.read_csv(data_file, encoding='utf-8-sig')
+            df = snapshot['df']
             
-            # 检查并统一分位点列名
-            if 'PE-TTM(分位点%)' in df.columns and 'PB(分位点%)' in df.columns:
-                df = df.rename(columns={'PE-TTM(分位点%)': 'PE分位点', 'PB(分位点%)': 'PB分位点'})
-            elif 'PE-TTM(分位点%)' in df.columns:
-                df = df.rename(columns={'PE-TTM(分位点%)': 'PE分位点'})
-            elif 'PB(分位点%)' in df.columns:
-                df = df.rename(columns={'PB(分位点%)': 'PB分位点'})
+            # 选择温度模型（入库时已批量算好所有模型）
+            model, temperature_column = resolve_model(request.args.get('model', DEFAULT_MODEL), df.columns)
             
-            # 重新计算基金温度，根据指数类型区分处理
-            if 'PE分位点' in df.columns and 'PB分位点' in df.columns:
-                # 计算PE分位点和PB分位点的数值（将百分比转换为小数）
-                def process_quantile(quantile):
-                    if pd.isna(quantile) or quantile == '-' or quantile == '':
-                        return 0
-                    elif isinstance(quantile, str):
-                        # 处理前面带等号的情况（如=0.8210）
-                        if quantile.startswith('='):
-                            quantile = quantile[1:]
-                        # 处理百分比的情况（如82.10%）
-                        if '%' in quantile:
-                            return float(quantile.replace('%', '')) / 100
-                        # 处理普通数值字符串
-                        try:
-                            return float(quantile)
-                        except ValueError:
-                            return 0
-                    elif isinstance(quantile, (int, float)):
-                        return quantile / 100 if quantile > 1 else quantile
-                    else:
-                        return 0
-                
-                df['PE分位点数值'] = df['PE分位点'].apply(process_quantile)
-                df['PB分位点数值'] = df['PB分位点'].apply(process_quantile)
-                
-                # 应用基金温度计算公式
-                df['基金温度'] = df.apply(lambda row: 
-                    row['PB分位点数值'] * 100 if is_industry_index(row['指数名称']) 
-                    else (row['PE分位点数值'] + row['PB分位点数值']) / 2 * 100, axis=1)
+            # 筛选要展示的行（在原始数值上判断，不依赖渲染后的HTML）
+            search_keyword = request.args.get('search', '').strip()
+            keep = visible_rows(snapshot, temperature_column, search_keyword, request.args.get('category', '').strip())
             
-            # 美化温度显示
-            def format_temperature(temp):
-                if temp < 30:
-                    color = "success"
-                    icon = "❄️"
-                elif temp < 50:
-                    color = "info"
-                    icon = "🌤️"
-                elif temp < 70:
-                    color = "warning"
-                    icon = "🔥"
-                else:
-                    color = "danger"
-                    icon = "☀️"
-                
-                return f'<span class="badge bg-{color}">{icon} {temp:.1f}°C</span>'
+            # 获取更新时间
+            timestamp = os.path.getmtime(data_file)
+            update_time = f"{data_date} {datetime.fromtimestamp(timestamp).strftime('%H:%M:%S')}"
             
+            # 如果搜索没有结果，设置提示消息
+            if search_keyword and not keep.any():
+                data_html = f'<div class="alert alert-info">未找到包含 "{search_keyword}" 的指数。</div>'
+                return render_template('index.html', 
+                                    data_table=data_html, 
+                                    last_updated=update_time,
+                                    data_date=data_date,
+                                    search_keyword=search_keyword)
+            
+            # 排序与分页：按入库时预计算的排序置换切出当前页，只格式化和渲染这一页
+            sort, order, page, page_size = parse_paging_args(request.args)
+            positions = ordered_positions(snapshot, sort, order, keep=np.flatnonzero(keep), model=model)
+            total = len(positions)
+            start = (page - 1) * page_size
+            df = df.iloc[positions[start:start + page_size]].copy()
+            
+            if model != DEFAULT_MODEL:
+                df['基金温度'] = df[temperature_column]
+                df['投资建议'] = get_advice_column(df['基金温度'])
+            
+            # 美化温度显示（保留一位小数）
             if '基金温度' in df.columns:
-                df['基金温度'] = df['基金温度'].round(1)  # 保留一位小数
-                df['基金温度'] = df['基金温度'].apply(format_temperature)
+                df['基金温度'] = temperature_badges(pd.to_numeric(df['基金温度'], errors='coerce').round(1))
             
             # 添加类别字段
-            if '指数名称' in df.columns:
-                df['类别'] = df['指数名称'].apply(get_index_category)
+            if '类别' not in df.columns and '指数名称' in df.columns:
+                df['类别'] = classify_indices(df['指数名称'])
             
             # 确保所需字段存在（如果数据中没有，添加默认值）
-            if '今年以来涨跌幅' not in df.columns:
-                df['今年以来涨跌幅'] = '-'  # 默认为'-'
-            if '涨跌幅' not in df.columns:
-                df['涨跌幅'] = '-'  # 默认为'-'
-            if '关注度' not in df.columns:
-                df['关注度'] = '-'  # 默认为'-'
-            
-            # 提前重命名列名，避免后续使用新列名时出错
+            for col in ['今年以来涨跌幅', '涨跌幅', '关注度']:
+                if col not in df.columns:
+                    df[col] = '-'
             df = df.rename(columns={'今年以来涨跌幅': '今年涨跌', '涨跌幅': '昨涨跌'})
             
-            # 清理值中的等号
-            def clean_value(value):
-                if isinstance(value, str):
-                    # 移除开头的等号
-                    if value.startswith('='):
-                        return value[1:]
-                    # 移除所有等号
-                    return value.replace('=', '')
-                return value
-            
-            # 应用清理函数到相关列
+            # 清理等号，并将涨跌幅转换为百分比显示
             for col in ['今年涨跌', '昨涨跌', '关注度']:
-                if col in df.columns:
-                    df[col] = df[col].apply(clean_value)
-            
-            # 将涨跌幅转换为百分比显示
-            def to_percentage(value):
-                if value == '-' or pd.isna(value):
-                    return '-'
-                try:
-                    # 尝试转换为浮点数
-                    if isinstance(value, str):
-                        # 处理已经是百分比格式的情况
-                        if '%' in value:
-                            return value
-                        # 处理字符串数字
-                        num = float(value)
-                    else:
-                        num = float(value)
-                    
-                    # 如果数值大于1，可能已经是百分比形式（如10.15）
-                    if num > 1:
-                        return f"{num:.2f}%"
-                    # 否则转换为百分比（如0.1015 -> 10.15%）
-                    else:
-                        return f"{(num * 100):.2f}%"
-                except:
-                    # 如果转换失败，返回原值
-                    return value
-            
-            # 应用百分比转换函数到涨跌幅列
+                df[col] = strip_equals(df[col])
             for col in ['今年涨跌', '昨涨跌']:
-                if col in df.columns:
-                    df[col] = df[col].apply(to_percentage)
-            
-            # 删除没有数据的行
-            # 1. 删除今年涨跌、昨涨跌、关注度中没有数据的行
-            valid_rows = (df['今年涨跌'] != '-') & (df['昨涨跌'] != '-') & (df['关注度'] != '-')
-            df = df[valid_rows]
-            
-            # 2. 删除PE分位点和PB分位点没有数据的行
-            if 'PE分位点' in df.columns and 'PB分位点' in df.columns:
-                # 排除PE分位点或PB分位点为空、为'-'或为0的行
-                valid_quantiles = (df['PE分位点'] != '-') & (df['PB分位点'] != '-')
-                valid_quantiles &= ~pd.isna(df['PE分位点']) & ~pd.isna(df['PB分位点'])
-                
-                # 排除'0'或'0%'值
-                valid_quantiles &= (df['PE分位点'] != '0') & (df['PE分位点'] != '0%')
-                valid_quantiles &= (df['PB分位点'] != '0') & (df['PB分位点'] != '0%')
-                
-                # 检查是否为数值类型，如果是，排除0值
-                if pd.api.types.is_numeric_dtype(df['PE分位点']) and pd.api.types.is_numeric_dtype(df['PB分位点']):
-                    valid_quantiles &= (df['PE分位点'] != 0) & (df['PB分位点'] != 0)
-                
-                df = df[valid_quantiles]
-            
-            # 3. 清除计算报错的行（基金温度为0或为空的行）
-            if '基金温度' in df.columns:
-                # 检查是否为数值类型
-                if pd.api.types.is_numeric_dtype(df['基金温度']):
-                    # 排除0值和空值
-                    df = df[(df['基金温度'] != 0) & ~pd.isna(df['基金温度'])]
-                elif pd.api.types.is_string_dtype(df['基金温度']):
-                    # 如果是字符串类型（已经格式化），检查是否包含'0.0°C'或为空
-                    df = df[(df['基金温度'] != '<span class="badge bg-success">❄️ 0.0°C</span>') & (df['基金温度'] != '-')]
-            
-            # 获取搜索关键词
-            search_keyword = request.args.get('search', '').strip()
-            
-            # 如果有搜索关键词，过滤数据
-            if search_keyword:
-                # 筛选指数名称中包含搜索关键词的行
-                filtered_df = df[df['指数名称'].str.contains(search_keyword, case=False, na=False)]
-                # 如果没有结果，设置提示消息
-                if filtered_df.empty:
-                    data_html = f'<div class="alert alert-info">未找到包含 "{search_keyword}" 的指数。</div>'
-                    return render_template('index.html', 
-                                        data_table=data_html, 
-                                        last_updated=update_time,
-                                        data_date=data_date,
-                                        search_keyword=search_keyword)
-                df = filtered_df
-            
-            # 处理关注度为数值类型以便排序
-            df['关注度数值'] = df['关注度'].apply(lambda x: float(x.replace(',', '')) if isinstance(x, str) and x != '-' else 0)
-            
-            # 定义类别排序顺序
-            category_order = ['大盘', '小盘', '策略', '行业', '主题', '海外', '其他']
-            df['类别排序'] = df['类别'].map({cat: idx for idx, cat in enumerate(category_order)})
-            
-            # 排序：先按关注度降序，再按类别排序，最后按基金温度降序
-            df = df.sort_values(by=['关注度数值', '类别排序', '基金温度'], ascending=[False, True, False])
+                df[col] = format_percent(df[col])
             
             # 添加行号列
-            df['序号'] = range(1, len(df) + 1)
+            df['序号'] = range(start + 1, start + len(df) + 1)
             
-            # 重新命名和选择需要的列
+            # 选择需要的列（确保只选择数据框中存在的列）
             columns_to_keep = ['序号', '类别', '指数名称', '基金温度', '今年涨跌', '昨涨跌', '关注度', '投资建议']
-            
-            # 确保只选择数据框中存在的列
             columns_to_keep = [col for col in columns_to_keep if col in df.columns]
-            df_filtered = df[columns_to_keep]
-            
-            # 转换为HTML
-            data_html = df_filtered.to_html(
-                classes='table table-striped table-hover table-bordered',
-                index=False,
-                escape=False,
-                na_rep='-'
-            )
             
-            # 自定义表格生成函数，添加条件样式
-            def generate_custom_html_table(df):
-                # 创建表格开始标签
-                html = '<table class="table table-striped table-hover table-bordered">'
-                
-                # 列名映射字典，用于显示更友好的列名
-                column_mapping = {
-                    '今年以来涨跌幅': '今年涨跌',
-                    '涨跌幅': '昨涨跌'
-                }
-                
-                # 添加表头
-                html += '<thead><tr>'
-                for col in df.columns:
-                    display_name = column_mapping.get(col, col)
-                    html += f'<th>{display_name}</th>'
-                html += '</tr></thead>'
-                
-                # 添加表格内容
-                html += '<tbody>'
-                for _, row in df.iterrows():
-                    html += '<tr>'
-                    for col in df.columns:
-                        value = row[col]
-                        
-                        if col in ['今年涨跌', '昨涨跌'] and isinstance(value, str) and value != '-':
-                            # 处理涨跌幅列，添加颜色样式
-                            try:
-                                # 提取数字部分
-                                num_str = value.replace('%', '')
-                                num = float(num_str)
-                                if num < 0:
-                                    # 负数用绿色
-                                    html += f'<td style="color: green;">{value}</td>'
-                                else:
-                                    # 正数用红色
-                                    html += f'<td style="color: red;">{value}</td>'
-                            except:
-                                # 如果转换失败，使用默认样式
-                                html += f'<td>{value}</td>'
-                        elif col == '关注度' and value != '-':
-                            # 处理关注度列
-                            try:
-                                # 提取数字部分
-                                if isinstance(value, str):
-                                    num = float(value.replace(',', ''))
-                                else:
-                                    num = float(value)
-                                if num > 10000:
-                                    # 大于10000用红色
-                                    html += f'<td style="color: red;">{value}</td>'
-                                else:
-                                    html += f'<td>{value}</td>'
-                            except:
-                                html += f'<td>{value}</td>'
-                        elif col == '投资建议' and value != '-':
-                            # 处理投资建议列，添加颜色样式
-                            if '低估' in value:
-                                html += f'<td style="color: #28a745;">{value}</td>'  # 绿色
-                            elif '正常偏低' in value:
-                                html += f'<td style="color: #17a2b8;">{value}</td>'  # 蓝色
-                            elif '正常偏高' in value:
-                                html += f'<td style="color: #ffc107;">{value}</td>'  # 黄色
-                            elif '高估' in value:
-                                html += f'<td style="color: #dc3545;">{value}</td>'  # 红色
-                            else:
-                                html += f'<td>{value}</td>'
-                        else:
-                            # 其他列保持默认样式
-                            html += f'<td>{value}</td>'
-                    html += '</tr>'
-                html += '</tbody></table>'
-                
-                return html
+            # 生成带条件样式的HTML表格
+            data_html = render_table(df[columns_to_keep])
+            data_html += render_pagination(page, page_size, total, request.args)
             
-            # 生成自定义HTML表格
-            data_html = generate_custom_html_table(df_filtered)
-            
-            # 获取更新时间
-            timestamp = os.path.getmtime(data_file)
-            update_time = f"{data_date} {datetime.fromtimestamp(timestamp).strftime('%H:%M:%S')}"
+            # 可选：在表格前附加类别汇总（入库时已预计算）
+            if request.args.get('summary') == '1':
+                data_html = render_category_summary(snapshot['summary']['categories']) + data_html
         except Exception as e:
             data_html = f'<div class="alert alert-danger">读取数据出错: {str(e)}</div>'
             update_time = "数据错误"
@@ -416,6 +337,131 @@ def index():
                          data_date=data_date,
                          search_keyword=search_keyword)
 
+# ========== 公开接口 ==========
+@app.route('/api/categories')
+@snapshot_cached
+def api_categories():
+    """类别汇总：直接返回入库时预计算的结果"""
+    snapshot = load_snapshot()
+    if snapshot is None:
+        return jsonify({'data_date': None, 'categories': []})
+    return jsonify({
+        'data_date': get_latest_data_date(),
+        'categories': snapshot['summary']['categories'],
+    })
+
+@app.route('/api/matrix')
+@version_cached(lambda: (snapshot_version(), temperature_matrix.version()))
+def api_matrix():
+    """
+    温度热力图数据：?from=&to= 日期范围（yyyy-mm-dd，含两端），?category= 类别，?format=json|bin
+    直接切片入库时维护的温度矩阵，不读取CSV
+    """
+    try:
+        date_from = parse_date(request.args.get('from'))
+        date_to = parse_date(request.args.get('to'))
+    except ValueError:
+        return jsonify({'error': '日期格式应为 yyyy-mm-dd'}), 400
+    category = request.args.get('category', '').strip() or None
+    indices, categories, dates, values = temperature_matrix.slice(date_from, date_to, category)
+    if request.args.get('format') == 'bin':
+        return Response(encode_binary(indices, categories, dates, values), mimetype='application/octet-stream')
+    return Response(encode_json(indices, categories, dates, values), mimetype='application/json')
+
+@app.route('/api/indices')
+@snapshot_cached
+def api_indices():
+    """指数列表：支持 ?sort=&order=&page=&page_size=&search=&category=&model=，按预计算的排序置换分页"""
+    sort, order, page, page_size = parse_paging_args(request.args)
+    snapshot = load_snapshot()
+    if snapshot is None:
+        return jsonify({'total': 0, 'page': page, 'page_size': page_size, 'sort': sort, 'order': order,
+                        'model': DEFAULT_MODEL, 'rows': []})
+    
+    df = snapshot['df']
+    model, temperature_column = resolve_model(request.args.get('model', DEFAULT_MODEL), df.columns)
+    keep = visible_rows(snapshot, temperature_column, request.args.get('search', '').strip(),
+                        request.args.get('category', '').strip())
+    positions = ordered_positions(snapshot, sort, order, keep=np.flatnonzero(keep), model=model)
+    start = (page - 1) * page_size
+    page_positions = positions[start:start + page_size]
+    
+    def number(value, digits=2):
+        return None if pd.isna(value) else round(float(value), digits)
+    
+    page_df = df.iloc[page_positions]
+    ytd = snapshot['sort']['value:ytd'][page_positions]
+    change = snapshot['sort']['value:change'][page_positions]
+    if temperature_column in page_df.columns:
+        temperature = page_df[temperature_column].to_numpy(dtype=float)
+    else:
+        temperature = np.full(len(page_df), np.nan)
+    advice = get_advice_column(temperature) if model != DEFAULT_MODEL else page_df.get('投资建议', pd.Series([None] * len(page_df))).tolist()
+    rows = []
+    for i, (_, row) in enumerate(page_df.iterrows()):
+        rows.append({
+            '序号': start + i + 1,
+            '类别': row.get('类别'),
+            '指数名称': row.get('指数名称'),
+            '基金温度': number(temperature[i], 1),
+            '今年涨跌': number(ytd[i]),
+            '昨涨跌': number(change[i]),
+            '关注度': number(row.get('关注度数值')),
+            '投资建议': advice[i],
+        })
+    return jsonify({'total': int(len(positions)), 'page': page, 'page_size': page_size,
+                    'sort': sort, 'order': order, 'model': model, 'rows': rows})
+
+# ========== 更新通知 ==========
+@app.route('/events')
+def events():
+    """SSE：快照版本变化时推送消息，?rows=1 时附带变化的行"""
+    if snapshot_events.subscribers >= MAX_EVENT_SUBSCRIBERS:
+        return Response('连接数过多，请改用 /events/poll', status=503, headers={'Retry-After': '30'})
+    include_rows = request.args.get('rows') == '1'
+    since = request.headers.get('Last-Event-ID') or request.args.get('since')
+    
+    def stream():
+        yield 'retry: 5000\n\n'
+        last_version = since
+        current = snapshot_events.current()
+        if last_version is None and current is not None:
+            # 首次连接先告知当前版本
+            yield format_sse(current, include_rows=False)
+            last_version = current['version']
+        while True:
+            event = snapshot_events.wait(last_version, EVENT_HEARTBEAT)
+            if event is None:
+                yield ': keep-alive\n\n'
+                continue
+            last_version = event['version']
+            yield format_sse(event, include_rows)
+    
+    # 在返回响应前计数，连接数上限对同时到达的连接也有效；连接关闭时（包括还没开始发送）减去
+    snapshot_events.subscribe()
+    response = Response(stream(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(snapshot_events.unsubscribe)
+    return response
+
+@app.route('/events/poll')
+def events_poll():
+    """长轮询：版本与 ?since= 不同时立即返回，否则最多等待 timeout 秒，超时返回204"""
+    since = request.args.get('since')
+    timeout = min(max(request.args.get('timeout', LONG_POLL_TIMEOUT, type=float), 0), LONG_POLL_TIMEOUT)
+    snapshot_events.current()
+    snapshot_events.subscribe()
+    try:
+        event = snapshot_events.wait(since, timeout)
+    finally:
+        snapshot_events.unsubscribe()
+    if event is None:
+        return Response(status=204)
+    data = {'version': event['version']}
+    if request.args.get('rows') == '1':
+        data['changed'] = event['changed']
+    return jsonify(data)
+
 # ========== 登录相关 ==========
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -450,6 +496,11 @@ def logout():
 def upload():
     """上传页面：需要密码才能访问"""
     if request.method == 'POST':
+        # 内存连分块处理的余量都没有时，在读取请求体之前就拒绝上传，让客户端稍后重试
+        if plan_ingest(request.content_length or 0) == 'reject':
+            return Response(f'服务器内存紧张，请 {RETRY_AFTER_SECONDS} 秒后重试', status=503,
+                            headers={'Retry-After': str(RETRY_AFTER_SECONDS)})
+        
         if 'file' not in request.files:
             flash('没有选择文件')
             return redirect(request.url)
@@ -486,19 +537,13 @@ def upload():
             
             flash(f'文件保存成功: {new_filename}')
             
-            # 处理数据
-            result_df = process_lixingren_csv(file_path)
+            # 处理数据，保存结果并发布新快照，同时记录各阶段内存峰值
+            with MemoryTracker() as tracker:
+                result_df = ingest_file(file_path, tracker=tracker)
             
             if result_df is not None:
-                # 保存处理后的数据
-                processed_filename = f"processed_{file_date}.csv"
-                save_processed_data(result_df, processed_filename)
-                
-                # 更新最新数据
-                latest_path = os.path.join(DATA_DIR, 'latest_data.csv')
-                result_df.to_csv(latest_path, index=False, encoding='utf-8-sig')
-                
                 flash('✅ 数据处理完成！网站数据已更新。')
+                flash(f'内存峰值：{tracker.summary()}（RSS {tracker.peak_rss_mb():.1f}MB / 预算 {MEMORY_BUDGET_MB:.0f}MB）')
                 return redirect(url_for('index'))
             else:
                 flash('❌ 数据处理失败，请检查CSV格式')
@@ -509,6 +554,37 @@ def upload():
     
     return render_template('upload.html')
 
+@app.route('/api/export')
+@login_required
+def api_export():
+    """
+    批量导出历史处理结果：?from=&to=&format=csv|ndjson&columns=a,b&gzip=1
+    逐行读取 processed/ 下的文件并分块流式输出，不把数据整体载入内存
+    """
+    try:
+        date_from = parse_date(request.args.get('from', '').strip())
+        date_to = parse_date(request.args.get('to', '').strip()) or datetime.now().strftime('%Y-%m-%d')
+    except ValueError:
+        return jsonify({'error': '日期格式应为 yyyy-mm-dd'}), 400
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'不支持的格式: {export_format}'}), 400
+    
+    requested = [col.strip() for col in request.args.get('columns', '').split(',') if col.strip()]
+    files = list_processed_files(date_from, date_to)
+    columns = export_columns(files, requested)
+    chunks = stream_export(files, columns, export_format)
+    
+    filename = f"export_{date_from or 'all'}_{date_to}.{export_format}"
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    if request.args.get('gzip') == '1':
+        chunks = gzip_stream(chunks)
+        filename += '.gz'
+        mimetype = 'application/gzip'
+    
+    return Response(chunks, mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
 @app.route('/history')
 @login_required
 def history():
@@ -553,5 +629,55 @@ def history():
                          uploaded_files=uploaded_files,
                          processed_files=processed_files)
 
+@app.route('/admin/profiles')
+@login_required
+def admin_profiles():
+    """性能分析记录列表"""
+    rows = ''.join(
+        f'<tr><td><a href="{url_for("admin_profile", profile_id=record["id"])}">{record["id"]}</a></td>'
+        f'<td>{record["time"]}</td><td>{record["method"]}</td><td>{escape(record["path"])}</td>'
+        f'<td>{record["status"]}</td><td>{record["elapsed"] * 1000:.1f} ms</td></tr>'
+        for record in get_profiles())
+    if not rows:
+        rows = '<tr><td colspan="6">暂无记录。在任意地址后加 ?_profile=1 即可记录一次请求。</td></tr>'
+    return ('<h4>性能分析记录</h4><table class="table table-sm table-bordered">'
+            '<thead><tr><th>编号</th><th>时间</th><th>方法</th><th>地址</th><th>状态</th><th>耗时</th></tr></thead>'
+            f'<tbody>{rows}</tbody></table>')
+
+@app.route('/admin/profiles/<int:profile_id>')
+@login_required
+def admin_profile(profile_id):
+    """单次请求的热点报告，附 process_lixingren_csv 中的pandas调用耗时"""
+    record = get_profile(profile_id)
+    if record is None:
+        return '记录不存在或已被新的记录覆盖', 404
+    html = (f'<h4>#{record["id"]} {record["method"]} {escape(record["path"])} '
+            f'({record["status"]}, {record["elapsed"] * 1000:.1f} ms)</h4>')
+    if record['pandas']:
+        html += '<h5>process_lixingren_csv 中的pandas调用</h5><table class="table table-sm table-bordered">'
+        html += '<thead><tr><th>函数</th><th>调用次数</th><th>累计耗时</th></tr></thead><tbody>'
+        for func, calls, cumulative in record['pandas']:
+            html += f'<tr><td>{escape(func)}</td><td>{calls}</td><td>{cumulative * 1000:.2f} ms</td></tr>'
+        html += '</tbody></table>'
+    html += f'<h5>热点（按累计耗时）</h5><pre>{escape(record["report"])}</pre>'
+    return html
+
+@app.route('/admin/memory')
+@login_required
+def admin_memory():
+    """当前内存与最近请求前后的RSS"""
+    rows = ''.join(
+        f'<tr><td>{sample["time"]}</td><td>{sample["method"]}</td><td>{escape(sample["path"])}</td>'
+        f'<td>{sample["status"]}</td><td>{sample["rss_before_mb"]} MB</td><td>{sample["rss_after_mb"]} MB</td></tr>'
+        for sample in get_request_samples())
+    return (f'<h4>当前RSS {current_rss_mb():.1f}MB / 预算 {MEMORY_BUDGET_MB:.0f}MB</h4>'
+            '<table class="table table-sm table-bordered">'
+            '<thead><tr><th>时间</th><th>方法</th><th>地址</th><th>状态</th><th>请求前</th><th>请求后</th></tr></thead>'
+            f'<tbody>{rows}</tbody></table>')
+
+# 可选：每次入库成功后在后台导出静态站点（STATIC_EXPORT=1 开启）；放在所有路由注册之后
+if os.environ.get('STATIC_EXPORT') == '1':
+    add_publish_listener(lambda df, mtime: export_after_publish(app))
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+压缩与页面缓存基准：比较首页每次请求的传输字节数和CPU耗时
+
+用法：
+    python bench_compression.py [--rows 500] [--requests 50]
+"""
+import os
+import io
+import sys
+import time
+import random
+import argparse
+import tempfile
+import contextlib
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+
+def make_sample_csv(path, rows):
+    """生成理杏仁格式的样例数据"""
+    random.seed(0)
+    lines = ['指数名称,PE-TTM(分位点%),PB(分位点%),今年以来涨跌幅,涨跌幅,关注度']
+    for i in range(rows):
+        lines.append(f'中证指数{i},={random.random():.4f},={random.random():.4f},'
+                     f'={random.uniform(-0.3, 0.3):.4f},={random.uniform(-0.03, 0.03):.4f},'
+                     f'"={random.randint(1, 50000):,}"')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines))
+
+def measure(client, path, headers, requests, before_each=None):
+    """返回 (平均传输字节, 平均CPU毫秒)"""
+    total_bytes = 0
+    started = time.process_time()
+    for _ in range(requests):
+        if before_each:
+            before_each()
+        response = client.get(path, headers=headers)
+        total_bytes += len(response.get_data())
+    cpu_ms = (time.process_time() - started) * 1000 / requests
+    return total_bytes / requests, cpu_ms
+
+def main():
+    parser = argparse.ArgumentParser(description='首页压缩/缓存基准')
+    parser.add_argument('--rows', type=int, default=500, help='样例指数数量')
+    parser.add_argument('--requests', type=int, default=50, help='每种情况的请求次数')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_')
+    os.makedirs(os.path.join(workdir, 'data', 'uploaded'))
+    make_sample_csv(os.path.join(workdir, 'data', 'uploaded', '2025-01-02.csv'), args.rows)
+    os.chdir(workdir)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as app_module
+    client = app_module.app.test_client()
+    path = f'/?page_size={args.rows}'
+    # 模板缺失时基准只关心数据表本身
+    if not os.path.exists(os.path.join(app_module.app.root_path, app_module.app.template_folder, 'index.html')):
+        app_module.app.jinja_loader.searchpath.insert(0, workdir)
+        with open(os.path.join(workdir, 'index.html'), 'w', encoding='utf-8') as f:
+            f.write('<html><body>{{ data_table|safe }}</body></html>')
+
+    cases = [
+        ('改造前：不缓存、不压缩', {'Accept-Encoding': 'identity'}, app_module.page_cache.clear),
+        ('每次渲染并gzip压缩', {'Accept-Encoding': 'gzip'}, app_module.page_cache.clear),
+        ('按快照缓存（gzip）', {'Accept-Encoding': 'gzip'}, None),
+    ]
+    if app_module.negotiate_encoding('br') == 'br':
+        cases.append(('按快照缓存（brotli）', {'Accept-Encoding': 'br, gzip'}, None))
+
+    print(f'{args.rows} 行，每种情况 {args.requests} 次请求')
+    print(f'{"情况":<24}{"字节/请求":>12}{"CPU毫秒/请求":>16}')
+    for name, headers, before_each in cases:
+        with contextlib.redirect_stdout(io.StringIO()):
+            client.get(path, headers=headers)  # 预热
+            size, cpu_ms = measure(client, path, headers, args.requests, before_each)
+        print(f'{name:<24}{size:>12.0f}{cpu_ms:>16.2f}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+快照事件订阅基准：用真实的HTTP连接订阅 /events，测量大量空闲订阅者占用的CPU、线程和内存，
+以及发布新版本后全部订阅者收到消息的耗时
+
+/events 运行在WSGI服务器上，每个SSE连接在连接期间占用服务器的一个工作线程（空闲时阻塞在
+Condition 上，不占CPU，但占用线程和线程栈）。这里使用 werkzeug 的多线程服务器；客户端在同一进程中
+用非阻塞套接字实现，不额外占用线程
+
+用法：
+    python bench_events.py [--subscribers 1000] [--idle 5]
+"""
+import os
+import io
+import sys
+import time
+import socket
+import logging
+import argparse
+import tempfile
+import selectors
+import threading
+import contextlib
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+
+def _connect(port):
+    """发起一个 /events 订阅，返回非阻塞套接字"""
+    sock = socket.create_connection(('127.0.0.1', port))
+    sock.sendall(b'GET /events HTTP/1.1\r\nHost: localhost\r\nAccept: text/event-stream\r\n\r\n')
+    sock.setblocking(False)
+    return sock
+
+def _read_until(selector, buffers, predicate, timeout):
+    """读取所有连接的数据，直到每个连接的内容都满足 predicate，返回满足时刻 {套接字: 时间}"""
+    done = {}
+    deadline = time.perf_counter() + timeout
+    while len(done) < len(buffers) and time.perf_counter() < deadline:
+        for key, _ in selector.select(timeout=0.5):
+            sock = key.fileobj
+            try:
+                data = sock.recv(65536)
+            except BlockingIOError:
+                continue
+            if not data:
+                selector.unregister(sock)
+                continue
+            buffers[sock] += data
+            if sock not in done and predicate(buffers[sock]):
+                done[sock] = time.perf_counter()
+    return done
+
+def main():
+    parser = argparse.ArgumentParser(description='快照事件订阅基准')
+    parser.add_argument('--subscribers', type=int, default=1000, help='空闲订阅者数量')
+    parser.add_argument('--idle', type=float, default=5.0, help='空闲观察时长（秒）')
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix='bench_'))
+    # 基准不受默认连接数上限限制
+    os.environ['MAX_EVENT_SUBSCRIBERS'] = str(args.subscribers + 1)
+    import pandas as pd
+    from werkzeug.serving import make_server
+    with contextlib.redirect_stdout(io.StringIO()):
+        from app import app
+        from snapshot import publish_snapshot
+        from events import snapshot_events
+        from memory_guard import current_rss_mb
+
+    df = pd.DataFrame({'指数名称': ['沪深300', '中证500'], '类别': ['大盘', '小盘'],
+                       '基金温度': [40.0, 60.0], '投资建议': ['正常偏低，可继续持有', '正常偏高，注意风险']})
+    with contextlib.redirect_stdout(io.StringIO()):
+        publish_snapshot(df)
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    server.request_queue_size = 1024
+    threading.Thread(target=server.serve_forever, name='bench-server', daemon=True).start()
+    port = server.server_port
+
+    threads_before, rss_before = threading.active_count(), current_rss_mb()
+    selector = selectors.DefaultSelector()
+    buffers = {}
+    connect_started = time.perf_counter()
+    for _ in range(args.subscribers):
+        sock = _connect(port)
+        selector.register(sock, selectors.EVENT_READ)
+        buffers[sock] = b''
+    # 每个连接都收到当前版本后才算订阅完成
+    ready = _read_until(selector, buffers, lambda data: b'event: snapshot' in data, timeout=60)
+    print(f'{len(ready)}/{args.subscribers} 个订阅者已连接，用时 {time.perf_counter() - connect_started:.1f} 秒')
+    threads_per_subscriber = (threading.active_count() - threads_before) / max(len(ready), 1)
+    rss_per_subscriber = (current_rss_mb() - rss_before) * 1024 / max(len(ready), 1)
+    print(f'服务器线程 {threading.active_count() - threads_before} 个（每个订阅者 {threads_per_subscriber:.2f} 个），'
+          f'RSS 增加 {current_rss_mb() - rss_before:.1f}MB（每个订阅者约 {rss_per_subscriber:.0f}KB）')
+
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    time.sleep(args.idle)
+    cpu_idle = time.process_time() - cpu_start
+    wall_idle = time.perf_counter() - wall_start
+    print(f'{snapshot_events.subscribers} 个空闲订阅者，{wall_idle:.1f} 秒内CPU {cpu_idle * 1000:.1f} 毫秒'
+          f'（{cpu_idle / wall_idle * 100:.2f}% 单核）')
+
+    for sock in buffers:
+        buffers[sock] = b''
+    df.loc[0, '基金温度'] = 45.0
+    published = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        publish_snapshot(df)
+    received = _read_until(selector, buffers, lambda data: b'event: snapshot' in data, timeout=30)
+    if received:
+        print(f'发布新版本后 {len(received)} 个订阅者收到，用时 {(max(received.values()) - published) * 1000:.1f} 毫秒')
+
+    for sock in buffers:
+        sock.close()
+    server.shutdown()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
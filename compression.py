@@ -0,0 +1,125 @@
+# compression.py
+# 响应压缩与缓存：按 Accept-Encoding 协商 gzip/brotli，快照页面每个版本只渲染、压缩一次
+import gzip
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖
+    brotli = None
+
+# 小于该大小的响应不压缩（压缩收益不抵开销）
+MIN_COMPRESS_SIZE = 500
+# 参与压缩的内容类型
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'image/svg+xml')
+# 请求时动态压缩用较低级别，缓存页面只压缩一次，用最高级别
+DYNAMIC_LEVELS = {'br': 5, 'gzip': 6}
+CACHED_LEVELS = {'br': 11, 'gzip': 9}
+# 最多缓存的页面数（SCF内存只有128MB）
+PAGE_CACHE_SIZE = 64
+
+def supported_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def negotiate_encoding(accept_encoding):
+    """根据 Accept-Encoding 选择编码，优先brotli；不接受压缩时返回None"""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(','):
+        token, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[token.strip().lower()] = quality
+    for encoding in supported_encodings():
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > 0:
+            return encoding
+    return None
+
+def compress(data, encoding, levels=DYNAMIC_LEVELS):
+    """按指定编码压缩字节串"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=levels['br'])
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=levels['gzip'], mtime=0)
+    return data
+
+def is_compressible(response):
+    """判断响应是否值得压缩"""
+    if response.direct_passthrough or response.is_streamed:
+        return False
+    if response.status_code < 200 or response.status_code >= 300 or response.status_code == 204:
+        return False
+    if 'Content-Encoding' in response.headers:
+        return False
+    if not (response.mimetype or '').startswith(COMPRESSIBLE_TYPES):
+        return False
+    return response.content_length is None or response.content_length >= MIN_COMPRESS_SIZE
+
+def compress_response(response, accept_encoding):
+    """after_request 中调用：按需就地压缩响应体"""
+    if not is_compressible(response):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding(accept_encoding)
+    if encoding is None:
+        return response
+    data = response.get_data()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return response
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+class CachedPage:
+    """一次渲染结果及其各编码的压缩版本（按需生成，生成后复用）"""
+
+    def __init__(self, version, body, mimetype, status=200):
+        self.version = version
+        self.body = body
+        self.mimetype = mimetype
+        self.status = status
+        self._variants = {None: body}
+        self._lock = threading.Lock()
+
+    def variant(self, encoding):
+        if len(self.body) < MIN_COMPRESS_SIZE:
+            return None, self.body
+        with self._lock:
+            if encoding not in self._variants:
+                self._variants[encoding] = compress(self.body, encoding, CACHED_LEVELS)
+            return encoding, self._variants[encoding]
+
+class PageCache:
+    """按 (路径+查询, 登录状态) 缓存快照页面，快照版本变化后自动失效"""
+
+    def __init__(self, size=PAGE_CACHE_SIZE):
+        self.size = size
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            page = self._pages.get(key)
+            if page is None or page.version != version:
+                return None
+            self._pages.move_to_end(key)
+            return page
+
+    def put(self, key, page):
+        with self._lock:
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.size:
+                self._pages.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
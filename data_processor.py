@@ -2,8 +2,11 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime
+from contextlib import nullcontext
 import os
-from index_categories import get_index_category, is_industry_index
+from index_categories import CATEGORY_ORDER, classify_indices
+from temperature_models import compute_temperatures
+from schemas import schema_registry, detect_encoding
 
 # 判断是否在SCF环境
 def is_scf_environment():
@@ -60,160 +63,185 @@ def calculate_fund_temperature(pe, pb, pe_hist_high=None, pe_hist_low=None,
     temperature = pe_temp * 0.5 + pb_temp * 0.5
     return round(temperature, 1)
 
-def process_lixingren_csv(file_path):
-    """处理理杏仁CSV文件"""
+# 投资建议分档：(温度上限, 建议)
+ADVICE_BANDS = [
+    (30, "低估区域，可考虑定投"),
+    (50, "正常偏低，可继续持有"),
+    (70, "正常偏高，注意风险"),
+    (float('inf'), "高估区域，考虑减仓"),
+]
+
+def _no_stage(name):
+    """未记录内存时的空阶段"""
+    return nullcontext()
+
+def get_advice(temp):
+    """根据基金温度给出投资建议"""
+    for upper, advice in ADVICE_BANDS:
+        if temp < upper:
+            return advice
+    return ADVICE_BANDS[-1][1]
+
+def get_advice_column(temperatures):
+    """整列给出投资建议（与 get_advice 分档一致）"""
+    uppers = np.array([upper for upper, _ in ADVICE_BANDS])
+    labels = np.array([advice for _, advice in ADVICE_BANDS], dtype=object)
+    temps = np.asarray(temperatures, dtype=float)
+    idx = np.minimum(np.searchsorted(uppers, temps, side='right'), len(labels) - 1)
+    return labels[idx]
+
+# 按字符串读入后，整列（忽略空值）都是普通数字的列转为数值，与 pandas 自动推断的结果一致
+# （分位点写作 2.83 这类普通数字时，parse_quantile 依赖数值类型把大于1的值按百分数处理）
+def _read_csv(file_path, schema):
+    """按格式只读取需要的列（类型按格式中记录的读入），统一列名"""
+    df = pd.read_csv(file_path, encoding=schema.encoding, usecols=schema.usecols, dtype=schema.dtypes)
+    return df.rename(columns=schema.mapping)
+
+def _read_csv_chunks(file_path, schema, chunksize):
+    """分块版本的 _read_csv，逐块产出"""
+    reader = pd.read_csv(file_path, encoding=schema.encoding, usecols=schema.usecols,
+                         dtype=schema.dtypes, chunksize=chunksize)
+    for chunk in reader:
+        yield chunk.rename(columns=schema.mapping)
+
+def _read_csv_frames(file_path, schema, transform, chunksize=None):
+    """读取后交给 transform，返回结果列表"""
+    if chunksize is None:
+        return [transform(_read_csv(file_path, schema))]
+    return [transform(chunk) for chunk in _read_csv_chunks(file_path, schema, chunksize)]
+
+def _read_with_schema(file_path, schema, transform, chunksize=None):
+    """
+    按格式读取（见 _read_csv_frames），返回 transform 的结果列表
+    表头能解码但正文不能时，检测整个文件的编码并更正格式后重读一次；
+    按记录的列类型读不了时（数值列出现了非数字内容），按该文件重新判断列类型后重读一次
+    """
     try:
-        # 尝试不同编码读取
-        encodings = ['utf-8', 'gbk', 'gb2312', 'utf-8-sig']
-        df = None
-        
-        for encoding in encodings:
-            try:
-                df = pd.read_csv(file_path, encoding=encoding)
-                break
-            except:
-                pass
-        
-        if df is None:
-            return None
-        
-        # 重命名列，统一格式（根据你的CSV实际列名修改）
-        column_mapping = {
-            '指数名称': '指数名称',
-            '指数': '指数名称',
-            'name': '指数名称',
-            'PE': 'PE',
-            '市盈率': 'PE',
-            'pe': 'PE',
-            'PE-TTM(当前值)': 'PE',
-            'PB': 'PB',
-            '市净率': 'PB',
-            'pb': 'PB',
-            'PE分位点': 'PE分位点',
-            'PB分位点': 'PB分位点',
-            'PE-TTM(分位点%)': 'PE分位点',
-            'PB(分位点%)': 'PB分位点',
-        }
+        return _read_csv_frames(file_path, schema, transform, chunksize)
+    except UnicodeDecodeError:
+        encoding = detect_encoding(file_path)
+        if encoding is None or encoding == schema.encoding:
+            raise
+        schema_registry.update_encoding(schema, encoding)
+        schema_registry.update_dtypes(schema, file_path)
+        return _read_csv_frames(file_path, schema, transform, chunksize)
+    except ValueError:
+        if not schema_registry.update_dtypes(schema, file_path):
+            raise
+        return _read_csv_frames(file_path, schema, transform, chunksize)
+
+def _process_frame(df, updated_at):
+    """对读入的数据（整表或其中一块）计算温度与建议并过滤无效行"""
+    # 添加类别字段（如果不存在），按类别加权的温度模型需要用到
+    if '类别' not in df.columns and '指数名称' in df.columns:
+        df['类别'] = classify_indices(df['指数名称'])
+    
+    # 计算基金温度
+    if 'PE分位点' in df.columns and 'PB分位点' in df.columns:
+        # 一次性计算所有已注册的温度模型，默认模型写入"基金温度"列
+        df = compute_temperatures(df)
+    else:
+        # 用自定义函数计算（PE/PB含非数字内容时仍是字符串，先转为数值）
+        for col in ('PE', 'PB'):
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+        df['基金温度'] = df.apply(
+            lambda row: calculate_fund_temperature(
+                row.get('PE', 15),  # 默认值15
+                row.get('PB', 1.5)   # 默认值1.5
+            ), axis=1
+        )
+    
+    # 添加投资建议
+    df['投资建议'] = get_advice_column(df['基金温度'])
+    
+    # 添加更新时间
+    df['数据更新时间'] = updated_at
+    
+    # 删除没有数据的行
+    # 删除PE分位点和PB分位点没有数据的行
+    if 'PE分位点' in df.columns and 'PB分位点' in df.columns:
+        # 排除PE分位点或PB分位点为空、为'-'或为0的行
+        valid_quantiles = (df['PE分位点'] != '-') & (df['PB分位点'] != '-')
+        valid_quantiles &= ~pd.isna(df['PE分位点']) & ~pd.isna(df['PB分位点'])
         
-        df = df.rename(columns={k: v for k, v in column_mapping.items() if k in df.columns})
+        # 排除'0'或'0%'值
+        valid_quantiles &= (df['PE分位点'] != '0') & (df['PE分位点'] != '0%')
+        valid_quantiles &= (df['PB分位点'] != '0') & (df['PB分位点'] != '0%')
         
-        # 计算基金温度
-        if 'PE分位点' in df.columns and 'PB分位点' in df.columns:
-            # 处理分位点数据，转换为数值
-            def process_quantile(quantile):
-                if pd.isna(quantile) or quantile == '-' or quantile == '':
-                    return 0
-                elif isinstance(quantile, str):
-                    # 处理前面带等号的情况（如=0.8210）
-                    if quantile.startswith('='):
-                        quantile = quantile[1:]
-                    # 处理百分比的情况（如82.10%）
-                    if '%' in quantile:
-                        return float(quantile.replace('%', '')) / 100
-                    # 处理普通数值字符串
-                    try:
-                        return float(quantile)
-                    except ValueError:
-                        return 0
-                elif isinstance(quantile, (int, float)):
-                    return quantile / 100 if quantile > 1 else quantile
-                else:
-                    return 0
-            
-            # 应用分位点处理函数
-            df['PE分位点数值'] = df['PE分位点'].apply(process_quantile)
-            df['PB分位点数值'] = df['PB分位点'].apply(process_quantile)
-            
-            # 根据指数类型计算基金温度
-            df['基金温度'] = df.apply(lambda row: 
-                row['PB分位点数值'] * 100 if is_industry_index(row['指数名称']) 
-                else (row['PE分位点数值'] + row['PB分位点数值']) / 2 * 100, axis=1)
-            
-            df['基金温度'] = df['基金温度'].round(1)
-        else:
-            # 用自定义函数计算
-            df['基金温度'] = df.apply(
-                lambda row: calculate_fund_temperature(
-                    row.get('PE', 15),  # 默认值15
-                    row.get('PB', 1.5)   # 默认值1.5
-                ), axis=1
-            )
+        # 检查是否为数值类型，如果是，排除0值
+        if pd.api.types.is_numeric_dtype(df['PE分位点']) and pd.api.types.is_numeric_dtype(df['PB分位点']):
+            valid_quantiles &= (df['PE分位点'] != 0) & (df['PB分位点'] != 0)
         
-        # 添加投资建议
-        def get_advice(temp):
-            if temp < 30:
-                return "低估区域，可考虑定投"
-            elif temp < 50:
-                return "正常偏低，可继续持有"
-            elif temp < 70:
-                return "正常偏高，注意风险"
-            else:
-                return "高估区域，考虑减仓"
+        df = df[valid_quantiles]
+    
+    # 清除计算报错的行（基金温度为0或为空的行）
+    if '基金温度' in df.columns:
+        # 检查是否为数值类型
+        if pd.api.types.is_numeric_dtype(df['基金温度']):
+            # 排除0值和空值
+            df = df[(df['基金温度'] != 0) & ~pd.isna(df['基金温度'])]
+    
+    if df.empty:
+        return df
+    
+    # 处理关注度为数值类型以便排序
+    if '关注度' in df.columns:
+        def process_attention(x):
+            if not isinstance(x, str):
+                return 0
+            if x == '-' or x == '':
+                return 0
+            # 移除等号
+            x = x.replace('=', '')
+            # 移除千位分隔符
+            x = x.replace(',', '')
+            try:
+                return float(x)
+            except ValueError:
+                return 0
         
-        df['投资建议'] = df['基金温度'].apply(get_advice)
+        df['关注度数值'] = df['关注度'].apply(process_attention)
+    else:
+        df['关注度数值'] = 0
+    
+    return df
+
+def process_lixingren_csv(file_path, chunksize=None, tracker=None):
+    """
+    处理理杏仁CSV文件
+    chunksize 不为空时分块读取和计算（内存紧张时使用）；tracker 为 MemoryTracker 时记录各阶段内存峰值
+    """
+    stage = tracker.stage if tracker is not None else _no_stage
+    try:
+        updated_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
-        # 添加更新时间
-        df['数据更新时间'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        # 按表头指纹查找格式（同一格式只识别一次）
+        schema = schema_registry.resolve(file_path)
+        if schema is None:
+            return None
         
-        # 删除没有数据的行
-        # 删除PE分位点和PB分位点没有数据的行
-        if 'PE分位点' in df.columns and 'PB分位点' in df.columns:
-            # 排除PE分位点或PB分位点为空、为'-'或为0的行
-            valid_quantiles = (df['PE分位点'] != '-') & (df['PB分位点'] != '-')
-            valid_quantiles &= ~pd.isna(df['PE分位点']) & ~pd.isna(df['PB分位点'])
-            
-            # 排除'0'或'0%'值
-            valid_quantiles &= (df['PE分位点'] != '0') & (df['PE分位点'] != '0%')
-            valid_quantiles &= (df['PB分位点'] != '0') & (df['PB分位点'] != '0%')
-            
-            # 检查是否为数值类型，如果是，排除0值
-            if pd.api.types.is_numeric_dtype(df['PE分位点']) and pd.api.types.is_numeric_dtype(df['PB分位点']):
-                valid_quantiles &= (df['PE分位点'] != 0) & (df['PB分位点'] != 0)
+        if chunksize:
+            with stage('分块读取与计算'):
+                frames = _read_with_schema(file_path, schema, lambda chunk: _process_frame(chunk, updated_at), chunksize)
+                frames = [frame for frame in frames if not frame.empty]
+                df = pd.concat(frames) if frames else None
+        else:
+            with stage('读取CSV'):
+                df = _read_with_schema(file_path, schema, lambda frame: frame)[0]
             
-            df = df[valid_quantiles]
-        
-        # 清除计算报错的行（基金温度为0或为空的行）
-        if '基金温度' in df.columns:
-            # 检查是否为数值类型
-            if pd.api.types.is_numeric_dtype(df['基金温度']):
-                # 排除0值和空值
-                df = df[(df['基金温度'] != 0) & ~pd.isna(df['基金温度'])]
+            with stage('计算温度'):
+                df = _process_frame(df, updated_at)
         
         # 如果过滤后没有数据，返回None
-        if df.empty:
+        if df is None or df.empty:
             return None
         
-        # 处理关注度为数值类型以便排序
-        if '关注度' in df.columns:
-            def process_attention(x):
-                if not isinstance(x, str):
-                    return 0
-                if x == '-' or x == '':
-                    return 0
-                # 移除等号
-                x = x.replace('=', '')
-                # 移除千位分隔符
-                x = x.replace(',', '')
-                try:
-                    return float(x)
-                except ValueError:
-                    return 0
+        with stage('排序'):
+            df['类别排序'] = pd.Categorical(df['类别'], categories=CATEGORY_ORDER).codes
             
-            df['关注度数值'] = df['关注度'].apply(process_attention)
-        else:
-            df['关注度数值'] = 0
-        
-        # 定义类别排序顺序
-        category_order = ['大盘', '小盘', '策略', '行业', '主题', '海外', '其他']
-        
-        # 添加类别字段（如果不存在）
-        if '类别' not in df.columns and '指数名称' in df.columns:
-            df['类别'] = df['指数名称'].apply(get_index_category)
-        
-        df['类别排序'] = df['类别'].map({cat: idx for idx, cat in enumerate(category_order)})
-        
-        # 排序：先按关注度降序，再按类别排序，最后按基金温度降序
-        df = df.sort_values(by=['关注度数值', '类别排序', '基金温度'], ascending=[False, True, False])
+            # 排序：先按关注度降序，再按类别排序，最后按基金温度降序
+            df = df.sort_values(by=['关注度数值', '类别排序', '基金温度'], ascending=[False, True, False])
         
         return df
         
@@ -223,6 +251,47 @@ def process_lixingren_csv(file_path):
         traceback.print_exc()
         return None
 
+def compute_category_summary(df):
+    """
+    按类别汇总基金温度：数量、均值/中位数/最小/最大值，以及各投资建议档位的占比
+    返回按 CATEGORY_ORDER 排序的字典列表，可直接序列化为JSON
+    """
+    if df is None or df.empty or '基金温度' not in df.columns:
+        return []
+    
+    if '类别' in df.columns:
+        categories = df['类别'].astype(str)
+    else:
+        categories = pd.Series(classify_indices(df['指数名称']), index=df.index).astype(str)
+    temperature = pd.to_numeric(df['基金温度'], errors='coerce')
+    
+    # 分组统计（一次groupby完成全部聚合）
+    stats = temperature.groupby(categories).agg(['count', 'mean', 'median', 'min', 'max'])
+    
+    # 各档位占比
+    advice_labels = [advice for _, advice in ADVICE_BANDS]
+    if '投资建议' in df.columns:
+        advice = df['投资建议']
+    else:
+        advice = temperature.map(get_advice)
+    shares = pd.crosstab(categories, advice, normalize='index')
+    shares = shares.reindex(index=stats.index, columns=advice_labels, fill_value=0.0)
+    
+    order = {cat: idx for idx, cat in enumerate(CATEGORY_ORDER)}
+    summary = []
+    for category in sorted(stats.index, key=lambda c: order.get(c, len(order))):
+        row = stats.loc[category]
+        summary.append({
+            '类别': category,
+            '数量': int(row['count']),
+            '平均温度': round(float(row['mean']), 1),
+            '温度中位数': round(float(row['median']), 1),
+            '最低温度': round(float(row['min']), 1),
+            '最高温度': round(float(row['max']), 1),
+            '建议占比': {label: round(float(shares.at[category, label]), 4) for label in advice_labels},
+        })
+    return summary
+
 def save_processed_data(df, filename):
     """保存处理后的数据"""
     if df is None or df.empty:
@@ -0,0 +1,123 @@
+# events.py
+# 快照更新事件：通过 Server-Sent Events 或长轮询通知客户端，代替定时刷新首页
+import json
+import time
+import threading
+import pandas as pd
+from snapshot import load_snapshot, add_publish_listener
+
+# 每个事件最多附带的变化行数
+MAX_CHANGED_ROWS = 200
+# 变化行比较的列
+DIFF_COLUMNS = ['类别', '基金温度', '投资建议']
+# 检查快照文件版本的间隔（其他进程发布的快照靠它发现）
+POLL_INTERVAL = 2.0
+
+def diff_rows(old_df, new_df):
+    """找出新增或温度/建议发生变化的指数"""
+    if new_df is None or '指数名称' not in new_df.columns:
+        return []
+    columns = [col for col in DIFF_COLUMNS if col in new_df.columns]
+    new = new_df.drop_duplicates('指数名称').set_index('指数名称')[columns]
+    if old_df is None or '指数名称' not in old_df.columns:
+        changed = new
+    else:
+        old = old_df.drop_duplicates('指数名称').set_index('指数名称').reindex(new.index)
+        mask = pd.Series(False, index=new.index)
+        for col in columns:
+            if col not in old.columns:
+                mask[:] = True
+                break
+            before, after = old[col].astype(str), new[col].astype(str)
+            mask |= (before != after) & ~(old[col].isna() & new[col].isna())
+        changed = new[mask]
+    changed = changed.head(MAX_CHANGED_ROWS).reset_index()
+    return json.loads(changed.to_json(orient='records', force_ascii=False))
+
+class SnapshotEvents:
+    """
+    快照版本广播：所有订阅者在同一个 Condition 上等待，空闲连接不占CPU
+    版本变化由快照发布回调（本进程）或后台轮询（其他进程）触发
+    """
+
+    def __init__(self, poll_interval=POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._cond = threading.Condition()
+        self._event = None       # 最新事件：{'version', 'changed'}
+        self._df = None
+        self._subscribers = 0
+        self._poller = None
+
+    @property
+    def subscribers(self):
+        return self._subscribers
+
+    def current(self):
+        """当前事件（没有快照时为None）"""
+        with self._cond:
+            if self._event is None:
+                snapshot = load_snapshot()
+                if snapshot is not None:
+                    self._df = snapshot['df']
+                    self._event = {'version': str(snapshot['mtime']), 'changed': []}
+            return self._event
+
+    def publish(self, df, version):
+        """记录新版本并唤醒所有等待者"""
+        version = str(version)
+        with self._cond:
+            if self._event is not None and self._event['version'] == version:
+                return
+            changed = diff_rows(self._df, df)
+            self._df = df
+            self._event = {'version': version, 'changed': changed}
+            self._cond.notify_all()
+
+    def wait(self, since, timeout):
+        """等待版本与 since 不同，超时返回None"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._event is not None and self._event['version'] != since, timeout)
+            if self._event is not None and self._event['version'] != since:
+                return self._event
+            return None
+
+    def subscribe(self):
+        with self._cond:
+            self._subscribers += 1
+            self._ensure_poller()
+
+    def unsubscribe(self):
+        with self._cond:
+            self._subscribers -= 1
+
+    def _ensure_poller(self):
+        """有订阅者时才运行后台轮询线程（调用方持有 self._cond）"""
+        if self._poller is None:
+            self._poller = threading.Thread(target=self._poll, name='snapshot-events', daemon=True)
+            self._poller.start()
+
+    def _poll(self):
+        """轮询快照版本，订阅者全部离开后退出，下次订阅时重新启动"""
+        while True:
+            with self._cond:
+                if self._subscribers <= 0:
+                    self._poller = None
+                    return
+            try:
+                snapshot = load_snapshot()
+                if snapshot is not None:
+                    self.publish(snapshot['df'], snapshot['mtime'])
+            except Exception as e:
+                print(f"检查快照版本出错: {e}")
+            time.sleep(self.poll_interval)
+
+def format_sse(event, include_rows=True):
+    """把事件编码为SSE消息"""
+    data = {'version': event['version']}
+    if include_rows:
+        data['changed'] = event['changed']
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"id: {event['version']}\nevent: snapshot\ndata: {payload}\n\n"
+
+snapshot_events = SnapshotEvents()
+add_publish_listener(lambda df, mtime: snapshot_events.publish(df, mtime))
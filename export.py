@@ -0,0 +1,130 @@
+# export.py
+# 历史数据批量导出：逐行读取 processed/ 下的文件并以生成器流式输出，内存占用与时间跨度无关
+import os
+import io
+import csv
+import json
+import zlib
+from datetime import datetime
+from utils import extract_date_from_filename
+
+# 判断是否在SCF环境
+def is_scf_environment():
+    return 'TENCENTCLOUD_RUNENV' in os.environ
+
+# 数据存储路径处理
+if is_scf_environment():
+    # SCF环境：使用/tmp目录（可写）
+    DATA_DIR = '/tmp/data'
+else:
+    # 本地环境
+    DATA_DIR = 'data'
+
+PROCESSED_DIR = os.path.join(DATA_DIR, 'processed')
+EXPORT_FORMATS = ('csv', 'ndjson')
+# 每次输出的块大小
+CHUNK_SIZE = 64 * 1024
+DATE_COLUMN = '日期'
+
+def parse_date(value):
+    """解析 yyyy-mm-dd，空值返回None，格式错误抛出ValueError"""
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+
+def list_processed_files(date_from=None, date_to=None, processed_dir=PROCESSED_DIR):
+    """按日期升序列出范围内的处理结果文件 [(日期, 路径)]"""
+    if not os.path.exists(processed_dir):
+        return []
+    files = []
+    for name in os.listdir(processed_dir):
+        if not name.endswith('.csv'):
+            continue
+        file_date = extract_date_from_filename(name)
+        if not file_date:
+            continue
+        if (date_from and file_date < date_from) or (date_to and file_date > date_to):
+            continue
+        files.append((file_date, os.path.join(processed_dir, name)))
+    files.sort()
+    return files
+
+def _read_header(path):
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        return next(csv.reader(f), [])
+
+def export_columns(files, requested=None):
+    """
+    确定导出的列：指定了列时按指定顺序；否则取所有文件表头的并集（只读取表头）
+    第一列固定为日期
+    """
+    if requested:
+        columns = [col for col in requested if col != DATE_COLUMN]
+    else:
+        columns = []
+        seen = set()
+        for _, path in files:
+            for col in _read_header(path):
+                if col not in seen:
+                    seen.add(col)
+                    columns.append(col)
+    return [DATE_COLUMN] + columns
+
+def iter_rows(files, columns):
+    """逐文件逐行产出按 columns 投影后的值列表，文件中没有的列为空字符串"""
+    for file_date, path in files:
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                continue
+            positions = {col: idx for idx, col in enumerate(header)}
+            picks = [positions.get(col) for col in columns[1:]]
+            for row in reader:
+                yield [file_date] + [row[idx] if idx is not None and idx < len(row) else '' for idx in picks]
+
+def _buffered(pieces):
+    """把小片段攒成约 CHUNK_SIZE 的块再输出"""
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= CHUNK_SIZE:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+def _csv_pieces(files, columns):
+    line = io.StringIO()
+    writer = csv.writer(line)
+    yield '\ufeff'  # 与其他CSV一致带BOM，方便Excel打开
+    writer.writerow(columns)
+    for values in iter_rows(files, columns):
+        writer.writerow(values)
+        if line.tell() >= CHUNK_SIZE:
+            yield line.getvalue()
+            line.seek(0)
+            line.truncate()
+    yield line.getvalue()
+
+def _ndjson_pieces(files, columns):
+    for values in iter_rows(files, columns):
+        record = {col: (value if value != '' else None) for col, value in zip(columns, values)}
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+def stream_export(files, columns, export_format='csv'):
+    """按格式产出字节块"""
+    pieces = _csv_pieces(files, columns) if export_format == 'csv' else _ndjson_pieces(files, columns)
+    return _buffered(pieces)
+
+def gzip_stream(chunks, level=6):
+    """把字节块流增量压缩为gzip流"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
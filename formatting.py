@@ -0,0 +1,140 @@
+# formatting.py
+# 展示层格式化：整列解析为数值、整列生成显示文本和HTML，不再逐个单元格 apply
+import numpy as np
+import pandas as pd
+
+# 温度档位：(温度上限, 徽章颜色, 图标)
+TEMPERATURE_BADGES = [
+    (30, 'success', '❄️'),
+    (50, 'info', '🌤️'),
+    (70, 'warning', '🔥'),
+    (float('inf'), 'danger', '☀️'),
+]
+
+# 投资建议关键词 -> 文字颜色（按顺序匹配）
+ADVICE_COLORS = [
+    ('低估', '#28a745'),     # 绿色
+    ('正常偏低', '#17a2b8'),  # 蓝色
+    ('正常偏高', '#ffc107'),  # 黄色
+    ('高估', '#dc3545'),     # 红色
+]
+
+def _is_text(series):
+    return pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)
+
+def clean_text(series):
+    """去掉Excel导出时残留的等号，统一为字符串"""
+    return series.astype(str).str.replace('=', '', regex=False)
+
+def parse_number(series):
+    """把 '=12,345' 这类文本整列解析为数值，无法解析的为NaN"""
+    return pd.to_numeric(clean_text(series).str.replace(',', '', regex=False), errors='coerce')
+
+def parse_percent(series):
+    """
+    把涨跌幅整列解析为百分数数值（与首页显示一致）：
+    带%的按原值；大于1的视为已是百分数；否则乘以100
+    """
+    text = clean_text(series)
+    has_percent = text.str.contains('%', regex=False).to_numpy()
+    num = pd.to_numeric(text.str.replace('%', '', regex=False), errors='coerce').to_numpy(dtype=float)
+    return np.where(has_percent | (num > 1), num, num * 100)
+
+def strip_equals(series):
+    """去掉字符串中的等号：开头是等号时只去掉开头那个，否则去掉全部；非字符串值保持不变"""
+    if not _is_text(series):
+        return series
+    text = series.str
+    stripped = pd.Series(np.where(text.startswith('=', na=False), text[1:], text.replace('=', '', regex=False)),
+                         index=series.index, dtype=object)
+    return stripped.where(series.map(type, na_action='ignore').eq(str), series)
+
+def format_percent(series):
+    """
+    涨跌幅整列转换为百分比文本：
+    '-'/空值 -> '-'；已带%的保持原样；大于1的视为已是百分数；否则乘以100；无法解析的保持原值
+    """
+    if series.empty:
+        return pd.Series([], index=series.index, dtype=object)
+    missing = series.isna().to_numpy() | (series == '-').to_numpy()
+    if _is_text(series):
+        is_str = series.map(type, na_action='ignore').eq(str).to_numpy()
+        has_percent = is_str & series.str.contains('%', regex=False, na=False).to_numpy()
+        num = pd.to_numeric(series.where(~has_percent), errors='coerce').to_numpy(dtype=float)
+    else:
+        has_percent = np.zeros(len(series), dtype=bool)
+        num = series.to_numpy(dtype=float)
+    unparsed = np.isnan(num)
+    scaled = np.where(num > 1, num, num * 100)
+    text = np.char.add(np.char.mod('%.2f', np.where(unparsed, 0, scaled)), '%').astype(object)
+    original = series.to_numpy(dtype=object)
+    result = np.select([missing, has_percent, unparsed], ['-', original, original], default=text)
+    return pd.Series(result, index=series.index, dtype=object)
+
+def temperature_badges(temperatures):
+    """整列生成温度徽章HTML"""
+    temps = np.asarray(temperatures, dtype=float)
+    if not temps.size:
+        return np.empty(0, dtype=object)
+    conditions = [temps < upper for upper, _, _ in TEMPERATURE_BADGES[:-1]]
+    colors = np.select(conditions, [color for _, color, _ in TEMPERATURE_BADGES[:-1]], default=TEMPERATURE_BADGES[-1][1])
+    icons = np.select(conditions, [icon for _, _, icon in TEMPERATURE_BADGES[:-1]], default=TEMPERATURE_BADGES[-1][2])
+    values = np.char.mod('%.1f', temps)
+    badges = ('<span class="badge bg-' + pd.Series(colors, dtype=object) + '">' + pd.Series(icons, dtype=object)
+              + ' ' + pd.Series(values, dtype=object) + '°C</span>')
+    return badges.to_numpy(dtype=object)
+
+def _cells(values, styles):
+    """由显示文本和样式（空字符串表示无样式）拼出整列 <td>"""
+    values = pd.Series(values, dtype=object).astype(str)
+    styles = pd.Series(styles, dtype=object)
+    opening = np.where(styles == '', '<td>', '<td style="' + styles + '">')
+    return (pd.Series(opening, dtype=object) + values + '</td>').to_numpy(dtype=object)
+
+def _change_styles(display):
+    """涨跌幅：负数绿色，其余红色，无法解析的不加样式"""
+    text = display.astype(str)
+    num = pd.to_numeric(text.str.replace('%', '', regex=False), errors='coerce').to_numpy(dtype=float)
+    is_str = display.map(type, na_action='ignore').eq(str).to_numpy()
+    styled = is_str & (text != '-').to_numpy() & ~np.isnan(num)
+    return np.where(styled, np.where(num < 0, 'color: green;', 'color: red;'), '')
+
+def _attention_styles(display):
+    """关注度：大于10000的红色"""
+    if _is_text(display):
+        is_str = display.map(type, na_action='ignore').eq(str)
+        num = pd.to_numeric(display.where(~is_str, display.str.replace(',', '', regex=False)), errors='coerce')
+    else:
+        num = pd.to_numeric(display, errors='coerce')
+    return np.where((display != '-').to_numpy() & (num > 10000).to_numpy(), 'color: red;', '')
+
+def _advice_styles(display):
+    """投资建议按关键词着色"""
+    text = display.astype(str)
+    conditions = [(display != '-').to_numpy() & text.str.contains(keyword, regex=False).to_numpy()
+                  for keyword, _ in ADVICE_COLORS]
+    return np.select(conditions, [f'color: {color};' for _, color in ADVICE_COLORS], default='')
+
+# 带条件样式的列
+CELL_STYLES = {
+    '今年涨跌': _change_styles,
+    '昨涨跌': _change_styles,
+    '关注度': _attention_styles,
+    '投资建议': _advice_styles,
+}
+
+def render_table(df):
+    """把要展示的列渲染为带条件样式的HTML表格"""
+    html = '<table class="table table-striped table-hover table-bordered">'
+    html += '<thead><tr>' + ''.join(f'<th>{col}</th>' for col in df.columns) + '</tr></thead>'
+    html += '<tbody>'
+    if len(df):
+        rows = np.full(len(df), '<tr>', dtype=object)
+        for col in df.columns:
+            display = df[col].reset_index(drop=True)
+            styler = CELL_STYLES.get(col)
+            styles = styler(display) if styler else np.full(len(df), '', dtype=object)
+            rows = rows + _cells(display, styles)
+        html += ''.join(rows + '</tr>')
+    html += '</tbody></table>'
+    return html
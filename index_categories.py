@@ -1,5 +1,10 @@
 # index_categories.py
 # 指数类别映射表
+import os
+import json
+from collections import deque
+import numpy as np
+import pandas as pd
 
 # 定义指数类别
 INDEX_CATEGORIES = {
@@ -86,13 +91,123 @@ INDEX_CATEGORIES = {
     "印度SENSEX30": "海外",
 }
 
+# 类别展示顺序
+CATEGORY_ORDER = ['大盘', '小盘', '策略', '行业', '主题', '海外', '其他']
+
 # 行业指数列表
 INDUSTRY_INDICES = [index for index, category in INDEX_CATEGORIES.items() if category == "行业"]
+INDUSTRY_INDEX_SET = frozenset(INDUSTRY_INDICES)
+
+# 未收录指数的关键词规则文件（按优先级排列，同时命中多个类别时取靠前的）
+CATEGORY_RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'category_rules.json')
+
+class KeywordMatcher:
+    """
+    Aho-Corasick 多关键词匹配器
+    构建一次后，每个名称只需扫描一遍即可找出命中的最高优先级类别
+    """
+    def __init__(self, rules):
+        # rules: [(类别, [关键词, ...]), ...]，靠前的优先级高
+        self._goto = [{}]
+        self._fail = [0]
+        self._best = [None]  # 每个状态可命中的最高优先级（数值越小越优先）
+        self.categories = [category for category, _ in rules]
+
+        for priority, (_, keywords) in enumerate(rules):
+            for keyword in keywords:
+                self._add(keyword.upper(), priority)
+        self._build_fail_links()
+
+    def _add(self, keyword, priority):
+        state = 0
+        for ch in keyword:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._best.append(None)
+            state = nxt
+        if self._best[state] is None or priority < self._best[state]:
+            self._best[state] = priority
+
+    def _build_fail_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                # 合并后缀状态的命中结果
+                inherited = self._best[self._fail[nxt]]
+                if inherited is not None and (self._best[nxt] is None or inherited < self._best[nxt]):
+                    self._best[nxt] = inherited
+
+    def match(self, text):
+        """返回命中的最高优先级类别，未命中返回None"""
+        best = None
+        state = 0
+        for ch in text.upper():
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            hit = self._best[state]
+            if hit is not None and (best is None or hit < best):
+                best = hit
+                if best == 0:
+                    break
+        return None if best is None else self.categories[best]
+
+def load_category_rules(path=CATEGORY_RULES_FILE):
+    """从数据文件读取关键词规则"""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        rules = json.load(f)
+    return [(rule['category'], rule['keywords']) for rule in rules]
+
+# 延迟编译的匹配器（首次使用时构建）
+_matcher = None
+
+def get_keyword_matcher():
+    """获取编译好的关键词匹配器"""
+    global _matcher
+    if _matcher is None:
+        _matcher = KeywordMatcher(load_category_rules())
+    return _matcher
 
 def get_index_category(index_name):
-    """获取指数所属类别"""
-    return INDEX_CATEGORIES.get(index_name, "其他")
+    """获取指数所属类别：先精确查表，再按关键词规则匹配"""
+    category = INDEX_CATEGORIES.get(index_name)
+    if category is not None:
+        return category
+    if not isinstance(index_name, str):
+        return "其他"
+    return get_keyword_matcher().match(index_name) or "其他"
+
+def classify_indices(names):
+    """
+    对整列指数名称分类，返回以 CATEGORY_ORDER 为类别的 pandas Categorical
+    相同名称只匹配一次
+    """
+    codes, uniques = pd.factorize(pd.Series(names), use_na_sentinel=True)
+    category_codes = {cat: idx for idx, cat in enumerate(CATEGORY_ORDER)}
+    other = category_codes["其他"]
+    unique_codes = np.fromiter(
+        (category_codes.get(get_index_category(name), other) for name in uniques),
+        dtype=np.int8, count=len(uniques))
+    # 空名称（编码为-1）归入"其他"
+    unique_codes = np.append(unique_codes, np.int8(other))
+    return pd.Categorical.from_codes(unique_codes[codes], categories=CATEGORY_ORDER)
 
 def is_industry_index(index_name):
     """判断是否为行业指数"""
-    return index_name in INDUSTRY_INDICES
+    return index_name in INDUSTRY_INDEX_SET
+
+def industry_mask(names):
+    """整列判断是否为行业指数，返回布尔数组"""
+    return pd.Series(names).isin(INDUSTRY_INDEX_SET).to_numpy()
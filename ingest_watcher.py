@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上传目录监听：在后台处理 uploaded/ 下新增或变更的CSV并发布快照，请求路径上不再做数据处理
+
+用法：
+    python ingest_watcher.py            # 常驻，轮询 uploaded/
+    python ingest_watcher.py --once     # 处理一遍后退出
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+from datetime import datetime
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from data_processor import process_lixingren_csv, save_processed_data
+from snapshot import publish_snapshot, load_snapshot
+from memory_guard import plan_ingest, INGEST_CHUNK_ROWS
+from snapshot_store import seed_snapshot
+from temperature_matrix import temperature_matrix
+from utils import extract_date_from_filename
+
+# 判断是否在SCF环境
+def is_scf_environment():
+    return 'TENCENTCLOUD_RUNENV' in os.environ
+
+# 数据存储路径处理
+if is_scf_environment():
+    # SCF环境：使用/tmp目录（可写）
+    DATA_DIR = '/tmp/data'
+else:
+    # 本地环境
+    DATA_DIR = 'data'
+
+UPLOAD_DIR = os.path.join(DATA_DIR, 'uploaded')
+PROCESSED_DIR = os.path.join(DATA_DIR, 'processed')
+
+def _file_date(path):
+    """文件名中的日期；文件名没有日期时使用文件的修改日期（与上传时使用当天日期一致）"""
+    file_date = extract_date_from_filename(os.path.basename(path))
+    if file_date:
+        return file_date
+    try:
+        return datetime.fromtimestamp(os.path.getmtime(path)).strftime('%Y-%m-%d')
+    except OSError:
+        return None
+
+def list_uploads(upload_dir=UPLOAD_DIR):
+    """列出上传目录中的CSV，按日期倒序（最新日期在前），同一日期按文件名倒序"""
+    if not os.path.exists(upload_dir):
+        return []
+    paths = [os.path.join(upload_dir, f) for f in os.listdir(upload_dir) if f.endswith('.csv')]
+    paths.sort(key=lambda path: (_file_date(path) or '', os.path.basename(path)), reverse=True)
+    return paths
+
+def needs_processing(path):
+    """processed/ 中没有对应日期的结果，或结果比上传文件旧"""
+    file_date = _file_date(path)
+    if not file_date:
+        return False
+    processed = os.path.join(PROCESSED_DIR, f"processed_{file_date}.csv")
+    return not os.path.exists(processed) or os.path.getmtime(processed) < os.path.getmtime(path)
+
+def ingest_file(path, make_latest=True, tracker=None, chunked=None):
+    """
+    处理单个上传文件并保存结果
+    make_latest 为True时同时发布为当前快照，否则只写入 processed/
+    chunked 为None时按当前内存余量自动决定是否分块读取；tracker 记录各阶段内存峰值
+    返回处理后的DataFrame，失败返回None
+    """
+    if chunked is None:
+        chunked = plan_ingest(os.path.getsize(path)) != 'normal'
+    if chunked:
+        print(f"内存余量不足，分块处理 {path}")
+    result_df = process_lixingren_csv(path, chunksize=INGEST_CHUNK_ROWS if chunked else None, tracker=tracker)
+    if result_df is None:
+        return None
+    file_date = _file_date(path)
+    stage = tracker.stage('保存结果') if tracker is not None else nullcontext()
+    with stage:
+        if make_latest:
+            publish_snapshot(result_df, file_date)
+        elif file_date:
+            save_processed_data(result_df, f"processed_{file_date}.csv")
+        # 就地更新温度矩阵中该日期的一列
+        try:
+            temperature_matrix.update(result_df, file_date)
+        except Exception as e:
+            print(f"更新温度矩阵出错: {e}")
+    return result_df
+
+def warm_up(timeout=None):
+    """
+    启动预热：先从快照存储拉取最新快照（配置了存储时）；仍没有快照时同步处理最新的上传文件，
+    然后把快照加载进内存，确保第一个请求到来前快照已就绪
+    """
+    started = time.time()
+    seed_snapshot()
+    if load_snapshot() is None:
+        for path in list_uploads():
+            if timeout is not None and time.time() - started > timeout:
+                print("预热超时，放弃处理")
+                break
+            print(f"预热：处理 {path}")
+            if ingest_file(path) is not None:
+                break
+    # 温度矩阵缺失时（例如升级后首次启动）由历史文件重建一次
+    if not temperature_matrix.exists() and os.path.exists(PROCESSED_DIR):
+        print(f"重建温度矩阵：{temperature_matrix.rebuild()} 个历史文件")
+    snapshot = load_snapshot()
+    print(f"预热完成，用时 {time.time() - started:.2f} 秒，快照{'已就绪' if snapshot is not None else '不存在'}")
+    return snapshot
+
+class UploadWatcher:
+    """轮询上传目录，用有界线程池处理新增或变更的文件"""
+
+    def __init__(self, upload_dir=UPLOAD_DIR, interval=5.0, max_workers=2):
+        self.upload_dir = upload_dir
+        self.interval = interval
+        self.max_workers = max_workers
+        self._seen = {}          # 路径 -> (修改时间, 大小)
+        self._candidates = {}    # 等待写入稳定的文件
+        self._pending = set()    # 正在处理的路径
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = None
+
+    def _signature(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def scan(self, settle=True):
+        """
+        扫描一次，提交需要处理的文件，返回提交数量
+        settle 为True时，文件需在连续两次扫描中保持不变才处理（避免读到写了一半的文件）
+        """
+        uploads = list_uploads(self.upload_dir)
+        newest = uploads[0] if uploads else None
+        submitted = 0
+        for path in uploads:
+            signature = self._signature(path)
+            if signature is None:
+                continue
+            with self._lock:
+                if path in self._pending or self._seen.get(path) == signature:
+                    continue
+                # 首次见到的文件若已有处理结果则跳过
+                if path not in self._seen and not needs_processing(path):
+                    self._seen[path] = signature
+                    continue
+                if settle and self._candidates.get(path) != signature:
+                    self._candidates[path] = signature
+                    continue
+                self._candidates.pop(path, None)
+                self._pending.add(path)
+            self._submit(path, signature, make_latest=(path == newest))
+            submitted += 1
+        return submitted
+
+    def _submit(self, path, signature, make_latest):
+        if self._executor is None:
+            self._run(path, signature, make_latest)
+        else:
+            self._executor.submit(self._run, path, signature, make_latest)
+
+    def _run(self, path, signature, make_latest):
+        try:
+            print(f"监听：处理 {path}")
+            if ingest_file(path, make_latest=make_latest) is None:
+                print(f"监听：处理失败 {path}")
+        except Exception as e:
+            print(f"监听：处理 {path} 出错: {e}")
+        finally:
+            with self._lock:
+                self._seen[path] = signature
+                self._pending.discard(path)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.scan()
+            except Exception as e:
+                print(f"监听：扫描出错: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """在后台线程中开始监听"""
+        if self._thread is not None:
+            return self
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='ingest')
+        self._thread = threading.Thread(target=self._loop, name='upload-watcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, wait=True):
+        """停止监听，等待正在处理的文件完成"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+def main():
+    parser = argparse.ArgumentParser(description='监听上传目录并处理新数据')
+    parser.add_argument('--once', action='store_true', help='处理一遍后退出')
+    parser.add_argument('--interval', type=float, default=5.0, help='轮询间隔（秒）')
+    parser.add_argument('--workers', type=int, default=2, help='处理线程数')
+    args = parser.parse_args()
+
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    warm_up()
+    watcher = UploadWatcher(interval=args.interval, max_workers=args.workers)
+    if args.once:
+        watcher.scan(settle=False)
+        return 0
+
+    watcher.start()
+    print(f"开始监听 {UPLOAD_DIR}，间隔 {args.interval} 秒")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        watcher.stop()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
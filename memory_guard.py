@@ -0,0 +1,174 @@
+# memory_guard.py
+# 内存统计与降级：SCF运行时内存上限128MB，接近预算时分块入库、丢弃渲染缓存或拒绝新上传，而不是被OOM杀掉
+import os
+import time
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from collections import deque
+
+# 运行时内存上限（MB）
+MEMORY_LIMIT_MB = float(os.environ.get('MEMORY_LIMIT_MB', '128'))
+# 内存预算（MB）：超过后开始降级，给解释器和突发分配留出余量
+MEMORY_BUDGET_MB = float(os.environ.get('MEMORY_BUDGET_MB', str(MEMORY_LIMIT_MB * 0.8)))
+# 上传入库时是否用 tracemalloc 统计各阶段的Python分配峰值（会使入库慢一个数量级，只在排查时打开），
+# 默认只记录各阶段结束时的RSS
+MEMORY_TRACE = os.environ.get('MEMORY_TRACE', '0') == '1'
+# 入库（读取、计算、发布快照）所需内存约为CSV文件大小的倍数（pandas对象列的膨胀）
+# 6.6MB/12万行的文件：一次读入时读取与计算增加约80MB，分块读入（逐块计算、只保留过滤后的结果）约48MB；
+# 之后发布快照（排序索引、温度矩阵等）两种方式相同，整个入库的峰值分别增加约113MB和102MB
+INGEST_MEMORY_FACTOR = 17
+CHUNKED_INGEST_MEMORY_FACTOR = 15
+# 分块入库时每块的行数
+INGEST_CHUNK_ROWS = 2000
+# 拒绝上传时建议客户端等待的秒数
+RETRY_AFTER_SECONDS = 30
+# 保留的请求内存采样数
+REQUEST_SAMPLE_SIZE = 100
+# 请求结束后两次释放内存的最小间隔（秒）
+RELIEVE_INTERVAL = float(os.environ.get('MEMORY_RELIEVE_INTERVAL', '30'))
+
+_page_size = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+_samples = deque(maxlen=REQUEST_SAMPLE_SIZE)
+_samples_lock = threading.Lock()
+_pressure_handlers = []
+_relief_lock = threading.Lock()
+_last_relief = 0.0
+
+def current_rss_mb():
+    """当前进程常驻内存（MB）；没有 /proc 时退回到历史峰值"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _page_size / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux单位为KB，macOS为字节
+        return peak / (1024 * 1024) if peak > 1 << 30 else peak / 1024
+
+def add_pressure_handler(func):
+    """注册内存紧张时调用的释放函数（例如清空页面缓存）"""
+    _pressure_handlers.append(func)
+
+def relieve_pressure():
+    """依次调用释放函数并回收垃圾，返回释放后的RSS"""
+    import gc
+    for handler in _pressure_handlers:
+        try:
+            handler()
+        except Exception as e:
+            print(f"释放内存出错: {e}")
+    gc.collect()
+    return current_rss_mb()
+
+def relieve_after_request(rss_before, rss_after):
+    """
+    请求结束后调用：超过预算、且本次请求使RSS增长时才释放，两次释放至少间隔 RELIEVE_INTERVAL 秒
+    （释放后RSS常常仍在预算之上，不加限制会让之后每个请求都清空缓存并做一次完整回收）
+    返回释放后的RSS，没有释放时返回None
+    """
+    global _last_relief
+    if rss_after < MEMORY_BUDGET_MB or rss_after <= rss_before:
+        return None
+    now = time.monotonic()
+    with _relief_lock:
+        if now - _last_relief < RELIEVE_INTERVAL:
+            return None
+        _last_relief = now
+    return relieve_pressure()
+
+def estimate_ingest_mb(file_size, chunked=False):
+    """估算入库一个CSV文件需要的内存（MB）"""
+    factor = CHUNKED_INGEST_MEMORY_FACTOR if chunked else INGEST_MEMORY_FACTOR
+    return file_size * factor / (1024 * 1024)
+
+def plan_ingest(file_size):
+    """
+    根据当前内存和文件大小决定入库方式：
+    'normal' 一次读入；'chunked' 分块读入；'reject' 连分块都没有余量
+    """
+    rss = current_rss_mb()
+    if rss + estimate_ingest_mb(file_size, chunked=True) > MEMORY_BUDGET_MB:
+        rss = relieve_pressure()
+    if rss + estimate_ingest_mb(file_size) <= MEMORY_BUDGET_MB:
+        return 'normal'
+    if rss + estimate_ingest_mb(file_size, chunked=True) <= MEMORY_BUDGET_MB:
+        return 'chunked'
+    return 'reject'
+
+class MemoryTracker:
+    """记录入库各阶段的内存峰值：tracemalloc 分配峰值与阶段结束时的RSS"""
+
+    def __init__(self, trace=MEMORY_TRACE):
+        self.trace = trace
+        self.stages = []
+        self._started_trace = False
+
+    def start(self):
+        if self.trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_trace = True
+        return self
+
+    def stop(self):
+        if self._started_trace:
+            tracemalloc.stop()
+            self._started_trace = False
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @contextmanager
+    def stage(self, name):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            # Python 3.9 起才有 reset_peak，之前的版本只能记录到目前为止的峰值
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            record = {
+                'stage': name,
+                'seconds': time.perf_counter() - started,
+                'rss_mb': current_rss_mb(),
+                'peak_mb': None,
+            }
+            if tracing:
+                record['peak_mb'] = max(tracemalloc.get_traced_memory()[1] - base, 0) / (1024 * 1024)
+            self.stages.append(record)
+
+    def summary(self):
+        """各阶段峰值的简短文字说明"""
+        parts = []
+        for record in self.stages:
+            if record['peak_mb'] is not None:
+                parts.append(f"{record['stage']} {record['peak_mb']:.1f}MB")
+            else:
+                parts.append(f"{record['stage']} RSS {record['rss_mb']:.1f}MB")
+        return '，'.join(parts)
+
+    def peak_rss_mb(self):
+        return max((record['rss_mb'] for record in self.stages), default=current_rss_mb())
+
+def record_request(method, path, status, rss_before, rss_after):
+    """记录一次请求前后的RSS"""
+    with _samples_lock:
+        _samples.append({
+            'method': method,
+            'path': path,
+            'status': status,
+            'rss_before_mb': round(rss_before, 1),
+            'rss_after_mb': round(rss_after, 1),
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        })
+
+def get_request_samples():
+    """最近的请求内存采样（新的在前）"""
+    with _samples_lock:
+        return list(reversed(_samples))
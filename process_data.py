@@ -23,12 +23,13 @@ else:
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from data_processor import process_lixingren_csv
+from snapshot import publish_snapshot
+import snapshot_store  # 注册发布回调：配置了快照存储时同步上传
 
 def main():
     # 设置文件路径
     uploaded_dir = os.path.join(DATA_DIR, 'uploaded')
     latest_csv = os.path.join(uploaded_dir, '2025-12-24.csv')
-    output_file = os.path.join(DATA_DIR, 'latest_data.csv')
     
     # 检查文件是否存在
     if not os.path.exists(latest_csv):
@@ -38,8 +39,8 @@ def main():
     try:
         result_df = process_lixingren_csv(latest_csv)
         if result_df is not None:
-            # 保存处理后的数据
-            result_df.to_csv(output_file, index=False, encoding='utf-8-sig')
+            # 保存处理后的数据并发布快照
+            publish_snapshot(result_df)
             return 0
         else:
             return 1
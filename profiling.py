@@ -0,0 +1,105 @@
+# profiling.py
+# 按需请求性能分析：管理员在任意地址后加 ?_profile=1，用 cProfile 记录本次请求的热点
+import io
+import time
+import pstats
+import cProfile
+import itertools
+import threading
+from collections import deque
+
+# 最多保留的分析记录数
+PROFILE_BUFFER_SIZE = 20
+# 报告中列出的函数数量
+REPORT_LIMIT = 30
+# 入库入口：从它出发在调用图中能到达的函数都算作入库代码，单独统计其中的pandas调用
+INGEST_ROOT = ('data_processor.py', 'process_lixingren_csv')
+
+_profiles = deque(maxlen=PROFILE_BUFFER_SIZE)
+_ids = itertools.count(1)
+_lock = threading.Lock()
+
+def start_profile():
+    """开始分析，返回 (profiler, 开始时间)"""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler, time.perf_counter()
+
+def _is_pandas(filename):
+    return '/pandas/' in filename.replace('\\', '/')
+
+def _ingest_functions(stats):
+    """
+    调用图中从 INGEST_ROOT 出发能到达的所有函数（包括 compute_temperatures、classify_indices 等辅助函数，
+    以及pandas回调的 apply 函数），不需要手工维护函数列表
+    调用图只记录调用方与被调用方，另有其他调用方的共用函数也会算入
+    """
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        for caller in callers:
+            callees.setdefault(caller, []).append(func)
+    filename, name = INGEST_ROOT
+    pending = [func for func in stats.stats if func[0].endswith(filename) and func[2] == name]
+    reachable = set(pending)
+    while pending:
+        for callee in callees.get(pending.pop(), ()):
+            if callee not in reachable:
+                reachable.add(callee)
+                pending.append(callee)
+    return reachable
+
+def pandas_breakdown(stats):
+    """
+    入库代码（见 _ingest_functions）中直接调用的pandas函数：按累计耗时排序
+    返回 [(函数, 调用次数, 累计秒数)]
+    """
+    ingest = _ingest_functions(stats)
+    rows = []
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        if not _is_pandas(func[0]):
+            continue
+        calls = 0
+        cumulative = 0.0
+        for caller, caller_stats in callers.items():
+            if caller in ingest and not _is_pandas(caller[0]):
+                calls += caller_stats[1]
+                cumulative += caller_stats[3]
+        if calls:
+            rows.append((pstats.func_std_string(func), calls, cumulative))
+    rows.sort(key=lambda row: row[2], reverse=True)
+    return rows
+
+def finish_profile(profiler, started, method, path, status):
+    """结束分析，生成报告并放入环形缓冲区，返回记录编号"""
+    profiler.disable()
+    elapsed = time.perf_counter() - started
+
+    output = io.StringIO()
+    stats = pstats.Stats(profiler, stream=output)
+    stats.sort_stats('cumulative').print_stats(REPORT_LIMIT)
+
+    record = {
+        'method': method,
+        'path': path,
+        'status': status,
+        'elapsed': elapsed,
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'report': output.getvalue(),
+        'pandas': pandas_breakdown(stats),
+    }
+    with _lock:
+        record['id'] = next(_ids)
+        _profiles.append(record)
+    return record['id']
+
+def get_profiles():
+    """最近的分析记录（新的在前）"""
+    with _lock:
+        return list(reversed(_profiles))
+
+def get_profile(profile_id):
+    with _lock:
+        for record in _profiles:
+            if record['id'] == profile_id:
+                return record
+    return None
@@ -0,0 +1,237 @@
+# schemas.py
+# CSV格式识别：按表头行的指纹缓存各厂商导出格式的列映射、编码、读取列和列类型，入库时直接查表，不再逐次推断类型
+import os
+import csv
+import json
+import codecs
+import hashlib
+import threading
+
+# 判断是否在SCF环境
+def is_scf_environment():
+    return 'TENCENTCLOUD_RUNENV' in os.environ
+
+# 数据存储路径处理
+if is_scf_environment():
+    # SCF环境：使用/tmp目录（可写）
+    DATA_DIR = '/tmp/data'
+else:
+    # 本地环境
+    DATA_DIR = 'data'
+
+SCHEMA_FILE = os.path.join(DATA_DIR, 'schemas.json')
+
+# 各厂商导出的列名 -> 统一列名（根据你的CSV实际列名修改）
+COLUMN_MAPPING = {
+    '指数名称': '指数名称',
+    '指数': '指数名称',
+    'name': '指数名称',
+    'PE': 'PE',
+    '市盈率': 'PE',
+    'pe': 'PE',
+    'PE-TTM(当前值)': 'PE',
+    'PB': 'PB',
+    '市净率': 'PB',
+    'pb': 'PB',
+    'PE分位点': 'PE分位点',
+    'PB分位点': 'PB分位点',
+    'PE-TTM(分位点%)': 'PE分位点',
+    'PB(分位点%)': 'PB分位点',
+    '今年以来涨跌幅': '今年以来涨跌幅',
+    '涨跌幅': '涨跌幅',
+    '关注度': '关注度',
+    '类别': '类别',
+}
+
+# 统一列名 -> 固定的读取类型；其他列在识别格式时按内容判断一次（见 infer_dtypes）
+COLUMN_DTYPES = {
+    '指数名称': 'str',
+    '类别': 'str',
+}
+
+# 依次尝试的文件编码
+ENCODINGS = ['utf-8', 'gbk', 'gb2312', 'utf-8-sig']
+
+# 表头行最大字节数
+MAX_HEADER_BYTES = 64 * 1024
+# 判断列类型时每次扫描的行数
+SCAN_CHUNK_ROWS = 10000
+
+class Schema:
+    """
+    一种导出格式：原始列名 -> 统一列名、编码、需要读取的列及其类型
+    列名保持表头中的原样（包括空格），读取时按原列名选列，映射到统一列名时才去掉空格
+    """
+
+    def __init__(self, fingerprint, header, encoding, mapping, column_dtypes=None):
+        self.fingerprint = fingerprint
+        self.header = header
+        self.encoding = encoding
+        self.mapping = mapping
+        # 原始列名 -> 读取类型，为None时尚未判断
+        self.column_dtypes = column_dtypes
+
+    @property
+    def usecols(self):
+        """只读取能映射到统一列名的列；一列都对不上时读取全部列"""
+        return list(self.mapping) or None
+
+    @property
+    def dtypes(self):
+        column_dtypes = self.column_dtypes or {}
+        return {source: COLUMN_DTYPES.get(target) or column_dtypes.get(source, 'str')
+                for source, target in self.mapping.items()}
+
+    def to_dict(self):
+        return {'header': self.header, 'encoding': self.encoding, 'mapping': self.mapping,
+                'dtypes': self.column_dtypes}
+
+    @classmethod
+    def from_dict(cls, fingerprint, data):
+        return cls(fingerprint, data['header'], data['encoding'], data['mapping'], data.get('dtypes'))
+
+def read_header_line(file_path):
+    """读取原始表头行（字节，不含换行）"""
+    with open(file_path, 'rb') as f:
+        return f.readline(MAX_HEADER_BYTES).rstrip(b'\r\n')
+
+def header_fingerprint(header_bytes):
+    """表头行的指纹：同一厂商、同一编码的导出文件表头完全相同"""
+    return hashlib.sha1(header_bytes).hexdigest()[:16]
+
+def _decode_header(header_bytes):
+    """按候选编码解码表头，返回 (编码, 列名列表)；带BOM时使用 utf-8-sig"""
+    if header_bytes.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig', next(csv.reader([header_bytes[len(codecs.BOM_UTF8):].decode('utf-8')]), [])
+    for encoding in ENCODINGS:
+        try:
+            return encoding, next(csv.reader([header_bytes.decode(encoding)]), [])
+        except UnicodeDecodeError:
+            continue
+    return None, None
+
+def build_schema(fingerprint, header_bytes):
+    """首次见到某种表头时生成格式：每个统一列名取第一个能映射的原始列"""
+    encoding, header = _decode_header(header_bytes)
+    if encoding is None:
+        return None
+    mapping = {}
+    for col in header:
+        target = COLUMN_MAPPING.get(col.strip())
+        if target is not None and col not in mapping and target not in mapping.values():
+            mapping[col] = target
+    return Schema(fingerprint, header, encoding, mapping)
+
+def infer_dtypes(file_path, schema):
+    """
+    扫描一遍文件（只读需要的列），判断各列的读取类型，与 pandas 自动推断的结果一致：
+    整列都是整数且没有空值为 int64，都是普通数字为 float64，否则按字符串读入
+    （分位点写作 2.83 这类普通数字时，parse_quantile 依赖数值类型把大于1的值按百分数处理）
+    """
+    import pandas as pd
+    columns = [source for source, target in schema.mapping.items() if target not in COLUMN_DTYPES]
+    dtypes = {col: 'int64' for col in columns}
+    if not columns:
+        return dtypes
+    reader = pd.read_csv(file_path, encoding=schema.encoding, usecols=columns, dtype=str, chunksize=SCAN_CHUNK_ROWS)
+    for chunk in reader:
+        for col in columns:
+            if dtypes[col] == 'str':
+                continue
+            values = chunk[col]
+            parsed = pd.to_numeric(values.dropna(), errors='coerce')
+            if parsed.isna().any():
+                dtypes[col] = 'str'
+            elif values.isna().any() or not pd.api.types.is_integer_dtype(parsed):
+                dtypes[col] = 'float64'
+    return dtypes
+
+def detect_encoding(file_path, block_size=1024 * 1024):
+    """逐块解码整个文件，返回第一个能完整解码的编码（内存占用与文件大小无关）"""
+    for encoding in ENCODINGS:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            with open(file_path, 'rb') as f:
+                while True:
+                    block = f.read(block_size)
+                    if not block:
+                        decoder.decode(b'', final=True)
+                        break
+                    decoder.decode(block)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return None
+
+class SchemaRegistry:
+    """指纹 -> 格式，保存在 schemas.json 中，进程重启后无需重新识别"""
+
+    def __init__(self, path=SCHEMA_FILE):
+        self.path = path
+        self._schemas = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._schemas is None:
+            self._schemas = {}
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    for fingerprint, data in json.load(f).items():
+                        self._schemas[fingerprint] = Schema.from_dict(fingerprint, data)
+            except (OSError, ValueError, KeyError):
+                pass
+        return self._schemas
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({fp: schema.to_dict() for fp, schema in self._schemas.items()}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def resolve(self, file_path):
+        """
+        按文件表头查找格式，没有时识别一次（包括按内容判断列类型）并记录；无法识别返回None
+        """
+        header_bytes = read_header_line(file_path)
+        fingerprint = header_fingerprint(header_bytes)
+        with self._lock:
+            schema = self._load().get(fingerprint)
+            if schema is None:
+                schema = build_schema(fingerprint, header_bytes)
+                if schema is None:
+                    return None
+                self._schemas[fingerprint] = schema
+                print(f"识别到新的CSV格式 {fingerprint}: {schema.mapping}")
+            elif schema.column_dtypes is not None:
+                return schema
+            # 新格式，或由旧版本记录、还没有列类型的格式
+            try:
+                schema.column_dtypes = infer_dtypes(file_path, schema)
+            except (UnicodeDecodeError, ValueError):
+                # 正文无法按表头的编码解码，读取时会检测编码后重新判断
+                schema.column_dtypes = None
+            self._save()
+        return schema
+
+    def update_encoding(self, schema, encoding):
+        """表头能解码但正文不能时，更正该格式的编码"""
+        with self._lock:
+            schema.encoding = encoding
+            self._save()
+
+    def update_dtypes(self, schema, file_path):
+        """
+        按记录的类型读不了某个文件时（例如数值列出现了 '='、'-' 或空值），按该文件重新判断列类型
+        返回类型是否有变化
+        """
+        dtypes = infer_dtypes(file_path, schema)
+        with self._lock:
+            if dtypes == schema.column_dtypes:
+                return False
+            schema.column_dtypes = dtypes
+            self._save()
+        print(f"CSV格式 {schema.fingerprint} 的列类型更新为: {dtypes}")
+        return True
+
+schema_registry = SchemaRegistry()
@@ -0,0 +1,302 @@
+# snapshot.py
+# 数据快照：latest_data.csv 以及入库时预计算的附属数据
+import os
+import json
+import threading
+from types import MappingProxyType
+import numpy as np
+import pandas as pd
+from data_processor import compute_category_summary, save_processed_data
+from formatting import parse_number, parse_percent, strip_equals
+from index_categories import CATEGORY_ORDER, classify_indices
+from temperature_models import TEMPERATURE_MODELS, DEFAULT_MODEL, compute_temperatures, model_column
+
+# 判断是否在SCF环境
+def is_scf_environment():
+    return 'TENCENTCLOUD_RUNENV' in os.environ
+
+# 数据存储路径处理
+if is_scf_environment():
+    # SCF环境：使用/tmp目录（可写）
+    DATA_DIR = '/tmp/data'
+else:
+    # 本地环境
+    DATA_DIR = 'data'
+
+SNAPSHOT_FILE = os.path.join(DATA_DIR, 'latest_data.csv')
+SUMMARY_FILE = os.path.join(DATA_DIR, 'latest_summary.json')
+SORT_FILE = os.path.join(DATA_DIR, 'latest_sort.npz')
+
+# 可排序的列：URL参数 -> 快照中的列（default 为首页默认的多列排序）
+SORT_COLUMNS = {
+    'default': None,
+    'temperature': '基金温度',
+    'ytd': '今年以来涨跌幅',
+    'change': '涨跌幅',
+    'attention': '关注度',
+    'category': '类别',
+    'name': '指数名称',
+}
+# 同时接受页面上显示的列名
+SORT_ALIASES = {
+    '基金温度': 'temperature',
+    '今年涨跌': 'ytd',
+    '昨涨跌': 'change',
+    '关注度': 'attention',
+    '类别': 'category',
+    '指数名称': 'name',
+}
+
+# 进程内缓存：当前版本的只读快照 {'mtime', 'df', 'summary', 'sort'}，换版本时整体替换引用，
+# 已取得旧快照的调用方不会看到缺键或新旧混合的内容
+_cache = None
+# 后台处理线程与上传请求可能同时发布快照
+_publish_lock = threading.Lock()
+# 快照发布后的回调：func(df, mtime)
+_publish_listeners = []
+
+def add_publish_listener(func):
+    """注册快照发布回调（如推送更新事件）"""
+    _publish_listeners.append(func)
+    return func
+
+def _write_json(path, data):
+    """原子写入JSON文件"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def build_summary(df, mtime, data_date=None):
+    """计算快照附属数据（入库时调用一次），data_date 为上传文件对应的数据日期"""
+    return {
+        'mtime': mtime,
+        'data_date': data_date,
+        'categories': compute_category_summary(df),
+    }
+
+def _sort_keys(df):
+    """各可排序列的排序键"""
+    n = len(df)
+    keys = {}
+    if '基金温度' in df.columns:
+        keys['temperature'] = pd.to_numeric(df['基金温度'], errors='coerce').to_numpy(dtype=float)
+    # 其他温度模型各自的排序键
+    for name in TEMPERATURE_MODELS:
+        column = model_column(name)
+        if name != DEFAULT_MODEL and column in df.columns:
+            keys[f'temperature@{name}'] = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=float)
+    for name in ('ytd', 'change'):
+        col = SORT_COLUMNS[name]
+        keys[name] = parse_percent(df[col]) if col in df.columns else np.full(n, np.nan)
+    if '关注度数值' in df.columns:
+        keys['attention'] = pd.to_numeric(df['关注度数值'], errors='coerce').to_numpy(dtype=float)
+    elif '关注度' in df.columns:
+        keys['attention'] = parse_number(df['关注度']).to_numpy(dtype=float)
+    if '类别' in df.columns:
+        keys['category'] = pd.Categorical(df['类别'], categories=CATEGORY_ORDER).codes.astype(float)
+        keys['category'][keys['category'] < 0] = np.nan
+    if '指数名称' in df.columns:
+        keys['name'] = df['指数名称'].astype(str).to_numpy()
+    return keys
+
+def display_mask(df):
+    """首页会展示的行：今年涨跌、昨涨跌、关注度都有数据"""
+    mask = np.ones(len(df), dtype=bool)
+    for col in ('今年以来涨跌幅', '涨跌幅', '关注度'):
+        if col not in df.columns:
+            return np.zeros(len(df), dtype=bool)
+        mask &= (strip_equals(df[col]) != '-').to_numpy()
+        if col != '关注度':
+            mask &= df[col].notna().to_numpy()
+    return mask
+
+def build_sort_index(df, mtime):
+    """
+    预计算每个可排序列、每个方向的稳定排序置换（入库时调用一次）
+    请求时只需按置换切片即可得到任意一页，空值始终排在最后
+    """
+    keys = _sort_keys(df)
+    arrays = {'mtime': np.array(mtime, dtype=np.int64)}
+
+    # 首页默认排序：关注度降序、类别、基金温度降序
+    default_by = [k for k in ('attention', 'category', 'temperature') if k in keys]
+    if default_by:
+        frame = pd.DataFrame({k: keys[k] for k in default_by})
+        for order, flip in (('desc', False), ('asc', True)):
+            ascending = [(k == 'category') != flip for k in default_by]
+            perm = frame.sort_values(by=default_by, ascending=ascending, kind='stable', na_position='last').index
+            arrays[f'default:{order}'] = perm.to_numpy(dtype=np.int32)
+    else:
+        arrays['default:desc'] = arrays['default:asc'] = np.arange(len(df), dtype=np.int32)
+
+    for name, key in keys.items():
+        series = pd.Series(key)
+        for order in ('asc', 'desc'):
+            perm = series.sort_values(ascending=(order == 'asc'), kind='stable', na_position='last').index
+            arrays[f'{name}:{order}'] = perm.to_numpy(dtype=np.int32)
+
+    # 数值型排序键与展示行一并保存，供JSON接口直接输出
+    for name in ('ytd', 'change'):
+        arrays[f'value:{name}'] = keys[name]
+    arrays['visible'] = display_mask(df)
+    return arrays
+
+def _write_npz(path, arrays):
+    """原子写入npz文件"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+def _read_npz(path):
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            return {k: data[k] for k in data.files}
+    except (OSError, ValueError):
+        return None
+
+def _published_data_date():
+    """当前快照的数据日期（没有快照或旧版本快照没有记录时为None）"""
+    if not os.path.exists(SNAPSHOT_FILE) or not os.path.exists(SUMMARY_FILE):
+        return None
+    try:
+        with open(SUMMARY_FILE, encoding='utf-8') as f:
+            summary = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if summary.get('mtime') != os.stat(SNAPSHOT_FILE).st_mtime_ns:
+        return None
+    return summary.get('data_date')
+
+def publish_snapshot(result_df, file_date=None):
+    """
+    发布新快照：保存processed文件、更新latest_data.csv，并写入预计算的附属数据
+    当前快照的数据日期比 file_date 新时（例如多个处理线程中较旧的文件后完成）只保存processed文件，不发布
+    返回快照附属数据，没有发布时返回None
+    """
+    global _cache
+    if file_date:
+        save_processed_data(result_df, f"processed_{file_date}.csv")
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    with _publish_lock:
+        published_date = _published_data_date()
+        if file_date and published_date and published_date > file_date:
+            print(f"当前快照的数据日期 {published_date} 比 {file_date} 新，不发布")
+            return None
+        tmp_path = SNAPSHOT_FILE + '.tmp'
+        result_df.to_csv(tmp_path, index=False, encoding='utf-8-sig')
+        os.replace(tmp_path, SNAPSHOT_FILE)
+
+        mtime = os.stat(SNAPSHOT_FILE).st_mtime_ns
+        summary = build_summary(result_df, mtime, file_date)
+        _write_json(SUMMARY_FILE, summary)
+        _write_npz(SORT_FILE, build_sort_index(result_df.reset_index(drop=True), mtime))
+        _cache = None
+
+    notify_publish(result_df, mtime)
+    return summary
+
+def notify_publish(df, mtime):
+    """依次调用快照发布回调（本进程发布，或从快照存储拉取到新版本后）"""
+    for listener in _publish_listeners:
+        try:
+            listener(df, mtime)
+        except Exception as e:
+            print(f"快照发布回调出错: {e}")
+
+def load_snapshot():
+    """
+    读取当前快照，按latest_data.csv的修改时间缓存在进程内
+    附属数据缺失或过期时（例如由旧版本脚本生成的快照）会重新计算一次
+    返回只读的 {'mtime', 'df', 'summary', 'sort'}，没有快照时返回None
+    """
+    global _cache
+    if not os.path.exists(SNAPSHOT_FILE) or os.path.getsize(SNAPSHOT_FILE) == 0:
+        return None
+
+    mtime = os.stat(SNAPSHOT_FILE).st_mtime_ns
+    cached = _cache
+    if cached is not None and cached['mtime'] == mtime:
+        return cached
+
+    # 快照由入库流程写出，列名已统一
+    df = pd.read_csv(SNAPSHOT_FILE, encoding='utf-8-sig')
+
+    # 旧快照缺少温度模型列时，加载时补算一次
+    missing_models = [name for name in TEMPERATURE_MODELS if model_column(name) not in df.columns]
+    if missing_models and {'PE分位点', 'PB分位点', '指数名称'} <= set(df.columns):
+        if '类别' not in df.columns:
+            df['类别'] = classify_indices(df['指数名称'])
+        df = compute_temperatures(df)
+
+    summary = None
+    if os.path.exists(SUMMARY_FILE):
+        try:
+            with open(SUMMARY_FILE, encoding='utf-8') as f:
+                summary = json.load(f)
+        except (OSError, ValueError):
+            summary = None
+    if not summary or summary.get('mtime') != mtime:
+        summary = build_summary(df, mtime)
+        _write_json(SUMMARY_FILE, summary)
+
+    sort_index = _read_npz(SORT_FILE) if os.path.exists(SORT_FILE) else None
+    if sort_index is None or int(sort_index['mtime']) != mtime:
+        sort_index = build_sort_index(df, mtime)
+        _write_npz(SORT_FILE, sort_index)
+
+    snapshot = MappingProxyType({'mtime': mtime, 'df': df, 'summary': summary, 'sort': sort_index})
+    _cache = snapshot
+    return snapshot
+
+def normalize_sort(sort, order):
+    """校验排序参数，无效时回退到默认排序"""
+    sort = SORT_ALIASES.get(sort, sort)
+    if sort not in SORT_COLUMNS:
+        sort = 'default'
+    if order not in ('asc', 'desc'):
+        order = 'desc'
+    return sort, order
+
+def ordered_positions(snapshot, sort='default', order='desc', keep=None, model=DEFAULT_MODEL):
+    """
+    按预计算的置换返回行位置
+    keep 为需要保留的行位置（如搜索、过滤后剩下的行），保持置换中的相对顺序
+    model 为非默认温度模型时，按温度排序使用该模型的置换
+    """
+    sort, order = normalize_sort(sort, order)
+    perm = None
+    if sort == 'temperature' and model != DEFAULT_MODEL:
+        perm = snapshot['sort'].get(f'temperature@{model}:{order}')
+    if perm is None:
+        perm = snapshot['sort'].get(f'{sort}:{order}')
+    if perm is None:
+        perm = snapshot['sort']['default:desc']
+    if keep is None:
+        return perm
+    mask = np.zeros(len(snapshot['df']), dtype=bool)
+    mask[np.asarray(keep, dtype=np.intp)] = True
+    return perm[mask[perm]]
+
+def render_category_summary(categories):
+    """把类别汇总渲染为HTML表格"""
+    if not categories:
+        return ''
+
+    labels = list(categories[0]['建议占比'].keys())
+    html = '<table class="table table-sm table-bordered category-summary">'
+    html += '<thead><tr><th>类别</th><th>数量</th><th>平均温度</th><th>温度中位数</th><th>最低温度</th><th>最高温度</th>'
+    for label in labels:
+        html += f'<th>{label}</th>'
+    html += '</tr></thead><tbody>'
+    for item in categories:
+        html += (f"<tr><td>{item['类别']}</td><td>{item['数量']}</td>"
+                 f"<td>{item['平均温度']:.1f}°C</td><td>{item['温度中位数']:.1f}°C</td>"
+                 f"<td>{item['最低温度']:.1f}°C</td><td>{item['最高温度']:.1f}°C</td>")
+        for label in labels:
+            html += f"<td>{item['建议占比'][label] * 100:.1f}%</td>"
+        html += '</tr>'
+    html += '</tbody></table>'
+    return html
@@ -0,0 +1,254 @@
+# snapshot_store.py
+# 快照持久化：SCF实例的 /tmp 是临时的，新实例启动时从共享存储拉取最新快照，上传后经同一存储发布给其他实例
+import os
+import abc
+import gzip
+import time
+import shutil
+import threading
+from datetime import datetime
+import snapshot
+from snapshot import SNAPSHOT_FILE, SUMMARY_FILE, SORT_FILE, DATA_DIR, add_publish_listener, notify_publish
+from temperature_matrix import temperature_matrix
+
+# 存储配置："后端:位置"，例如 local:/mnt/cfs/fund-snapshots；不设置时不启用
+SNAPSHOT_STORE = os.environ.get('SNAPSHOT_STORE', '')
+# 启动时拉取快照最多等待的秒数，超时后先用本地数据提供服务
+PULL_TIMEOUT = float(os.environ.get('SNAPSHOT_STORE_TIMEOUT', '5'))
+# 请求时检查远端版本的最小间隔（秒）
+CHECK_INTERVAL = float(os.environ.get('SNAPSHOT_STORE_CHECK_INTERVAL', '10'))
+# 存储中保留的历史版本数
+KEEP_VERSIONS = 3
+
+# 快照包含的文件：本地路径 -> 存储中的对象名（CSV压缩后存放）
+SNAPSHOT_OBJECTS = {
+    SNAPSHOT_FILE: 'latest_data.csv.gz',
+    SUMMARY_FILE: 'latest_summary.json',
+    SORT_FILE: 'latest_sort.npz',
+}
+
+STORE_BACKENDS = {}
+
+def register_store(scheme):
+    """装饰器：注册存储后端"""
+    def decorator(cls):
+        STORE_BACKENDS[scheme] = cls
+        return cls
+    return decorator
+
+class SnapshotStore(abc.ABC):
+    """
+    快照存储接口：每个版本是一组对象，另有一个指向最新版本的指针
+    版本号为发布时 latest_data.csv 的修改时间（纳秒），拉取后写回本地文件，便于直接比较
+    """
+
+    @abc.abstractmethod
+    def latest_version(self):
+        """最新版本号，没有快照时返回None（每次请求都可能调用，必须足够轻量）"""
+
+    @abc.abstractmethod
+    def get(self, version, name, dest_path):
+        """把某版本的对象下载到本地文件"""
+
+    @abc.abstractmethod
+    def put(self, version, objects):
+        """上传一个版本的对象 {对象名: 本地路径}，全部上传后再更新最新版本指针"""
+
+@register_store('local')
+class LocalDirStore(SnapshotStore):
+    """
+    以目录模拟对象存储（本地开发，或挂载到SCF的CFS共享目录）
+    布局：<root>/<版本>/<对象名>，<root>/LATEST 记录最新版本
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _pointer(self):
+        return os.path.join(self.root, 'LATEST')
+
+    def latest_version(self):
+        try:
+            with open(self._pointer(), encoding='utf-8') as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def get(self, version, name, dest_path):
+        shutil.copyfile(os.path.join(self.root, str(version), name), dest_path)
+
+    def put(self, version, objects):
+        version_dir = os.path.join(self.root, str(version))
+        os.makedirs(version_dir, exist_ok=True)
+        for name, path in objects.items():
+            tmp_path = os.path.join(version_dir, name + '.tmp')
+            shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, os.path.join(version_dir, name))
+        tmp_pointer = self._pointer() + '.tmp'
+        with open(tmp_pointer, 'w', encoding='utf-8') as f:
+            f.write(str(version))
+        os.replace(tmp_pointer, self._pointer())
+        self._prune(version)
+
+    def _prune(self, latest):
+        """只保留最近的几个版本"""
+        versions = sorted(int(name) for name in os.listdir(self.root) if name.isdigit())
+        for version in versions[:-KEEP_VERSIONS]:
+            if version != latest:
+                shutil.rmtree(os.path.join(self.root, str(version)), ignore_errors=True)
+
+def get_store(config=SNAPSHOT_STORE):
+    """按配置创建存储，未配置或后端未知时返回None"""
+    if not config:
+        return None
+    scheme, _, location = config.partition(':')
+    backend = STORE_BACKENDS.get(scheme)
+    if backend is None:
+        print(f"未知的快照存储后端: {scheme}")
+        return None
+    return backend(location)
+
+store = get_store()
+_sync_lock = threading.Lock()
+_last_check = 0.0
+
+def local_version():
+    """本地快照版本（latest_data.csv 的修改时间），没有快照时返回None"""
+    try:
+        return os.stat(SNAPSHOT_FILE).st_mtime_ns
+    except OSError:
+        return None
+
+def push_snapshot(df=None, mtime=None):
+    """把本地当前快照上传到存储（作为快照发布回调调用）"""
+    if store is None:
+        return None
+    # 与发布互斥，保证上传的三个文件属于同一版本
+    with snapshot._publish_lock:
+        version = local_version()
+        if version is None or (mtime is not None and version != mtime):
+            return None
+        # 刚从存储拉取的版本（或存储中已有更新的版本）不再上传
+        remote = store.latest_version()
+        if remote is not None and remote >= version:
+            return None
+        staging = os.path.join(DATA_DIR, '.store_push')
+        os.makedirs(staging, exist_ok=True)
+        objects = {}
+        for path, name in SNAPSHOT_OBJECTS.items():
+            if not os.path.exists(path):
+                continue
+            if name.endswith('.gz'):
+                compressed = os.path.join(staging, name)
+                with open(path, 'rb') as src, gzip.GzipFile(compressed, 'wb', compresslevel=6, mtime=0) as dst:
+                    shutil.copyfileobj(src, dst)
+                objects[name] = compressed
+            else:
+                objects[name] = path
+        try:
+            store.put(version, objects)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+    print(f"快照已上传到存储，版本 {version}")
+    return version
+
+def pull_snapshot():
+    """
+    存储中的版本比本地新时下载并替换本地快照，返回是否更新
+    下载的CSV修改时间设为存储版本号，附属数据中记录的版本随之匹配，无需重新计算
+    替换后与本地发布一样调用快照发布回调，并更新温度矩阵中该日期的一列
+    """
+    if store is None:
+        return False
+    with _sync_lock:
+        remote = store.latest_version()
+        local = local_version()
+        if remote is None or (local is not None and local >= remote):
+            return False
+        os.makedirs(DATA_DIR, exist_ok=True)
+        staging = os.path.join(DATA_DIR, '.store_pull')
+        os.makedirs(staging, exist_ok=True)
+        try:
+            fetched = {}
+            for path, name in SNAPSHOT_OBJECTS.items():
+                target = os.path.join(staging, os.path.basename(path))
+                try:
+                    if name.endswith('.gz'):
+                        store.get(remote, name, target + '.gz')
+                        with gzip.open(target + '.gz', 'rb') as src, open(target, 'wb') as dst:
+                            shutil.copyfileobj(src, dst)
+                    else:
+                        store.get(remote, name, target)
+                except OSError:
+                    # 附属数据缺失时加载快照会重新计算
+                    if path == SNAPSHOT_FILE:
+                        raise
+                    continue
+                fetched[path] = target
+            os.utime(fetched[SNAPSHOT_FILE], ns=(remote, remote))
+            with snapshot._publish_lock:
+                # 附属数据先就位，CSV最后替换，读取方按CSV版本判断
+                for path, target in fetched.items():
+                    if path != SNAPSHOT_FILE:
+                        os.replace(target, path)
+                os.replace(fetched[SNAPSHOT_FILE], SNAPSHOT_FILE)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+    print(f"已从存储拉取快照，版本 {remote}")
+    _after_pull(remote)
+    return True
+
+def _data_date(loaded):
+    """快照的数据日期：发布时记录在附属数据中；旧快照没有记录时取版本（修改时间）的日期"""
+    data_date = (loaded['summary'] or {}).get('data_date')
+    return data_date or datetime.fromtimestamp(loaded['mtime'] / 1e9).strftime('%Y-%m-%d')
+
+def _after_pull(version):
+    """拉取后加载快照，通知发布回调（推送事件、导出等）并更新温度矩阵"""
+    loaded = snapshot.load_snapshot()
+    if loaded is None or loaded['mtime'] != version:
+        return
+    notify_publish(loaded['df'], version)
+    try:
+        temperature_matrix.update(loaded['df'], _data_date(loaded))
+    except Exception as e:
+        print(f"更新温度矩阵出错: {e}")
+
+def seed_snapshot(timeout=PULL_TIMEOUT):
+    """
+    实例启动时拉取最新快照，最多等待 timeout 秒
+    超时后拉取在后台继续完成，返回是否已在时限内更新
+    """
+    if store is None:
+        return False
+    result = {}
+
+    def run():
+        try:
+            result['updated'] = pull_snapshot()
+        except Exception as e:
+            print(f"拉取快照出错: {e}")
+
+    worker = threading.Thread(target=run, name='snapshot-seed', daemon=True)
+    worker.start()
+    worker.join(timeout)
+    if worker.is_alive():
+        print(f"拉取快照超过 {timeout} 秒，先使用本地数据")
+    return result.get('updated', False)
+
+def sync_snapshot():
+    """请求前调用：距上次检查超过 CHECK_INTERVAL 时比较一次远端版本，有新版本就拉取"""
+    global _last_check
+    if store is None:
+        return False
+    now = time.monotonic()
+    if now - _last_check < CHECK_INTERVAL:
+        return False
+    _last_check = now
+    try:
+        return pull_snapshot()
+    except Exception as e:
+        print(f"同步快照出错: {e}")
+        return False
+
+add_publish_listener(push_snapshot)
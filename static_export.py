@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+静态站点导出：把当前快照的公开页面导出为静态文件，读流量可以直接由静态文件服务器提供，函数只处理登录和上传
+设置 STATIC_EXPORT=1 时每次入库成功后在后台线程导出，也可以手动运行
+页面直接调用视图函数渲染，不经过页面缓存和请求钩子，导出不会占用缓存或计入请求统计
+
+输出目录结构：
+    index.html, page-2.html ...               首页（每页 EXPORT_PAGE_SIZE=500 行，对应 /?page=N&page_size=500；
+                                              动态首页 / 默认每页 DEFAULT_PAGE_SIZE=50 行，分页与导出页面不同）
+    category/<类别>/index.html ...            各类别页面
+    search/manifest.json, search/indices-1.json ...   搜索用的JSON分片（与 /api/indices 相同）
+    api/categories.json                       类别汇总
+    static/                                   静态资源
+    以上文本文件另有预压缩的 .gz（以及安装了brotli时的 .br）
+
+用法：
+    python static_export.py                   # 导出到 STATIC_EXPORT_DIR（默认 data/site）
+    python static_export.py --output site     # 导出到指定目录
+    python static_export.py --check           # 导出后逐页与首页路由的响应比较
+"""
+import os
+import re
+import sys
+import json
+import shutil
+import argparse
+import threading
+from urllib.parse import urlsplit, parse_qs, urlencode, quote
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from compression import compress, supported_encodings, CACHED_LEVELS, MIN_COMPRESS_SIZE
+from index_categories import CATEGORY_ORDER
+
+# 判断是否在SCF环境
+def is_scf_environment():
+    return 'TENCENTCLOUD_RUNENV' in os.environ
+
+# 数据存储路径处理
+if is_scf_environment():
+    # SCF环境：使用/tmp目录（可写）
+    DATA_DIR = '/tmp/data'
+else:
+    # 本地环境
+    DATA_DIR = 'data'
+
+EXPORT_DIR = os.environ.get('STATIC_EXPORT_DIR', os.path.join(DATA_DIR, 'site'))
+# 每个静态页面/搜索分片的行数（与接口允许的最大分页一致）
+EXPORT_PAGE_SIZE = 500
+# 生成预压缩版本的文件类型
+PRECOMPRESS_SUFFIXES = ('.html', '.json', '.css', '.js', '.svg', '.txt')
+
+_export_lock = threading.Lock()
+# 发布回调的后台导出状态
+_state_lock = threading.Lock()
+_state = {'running': False, 'pending': False}
+_PAGE_LINK = re.compile(r'href="(/\?[^"]*)"')
+
+def page_filename(page):
+    return 'index.html' if page == 1 else f'page-{page}.html'
+
+def page_dir(category=''):
+    """类别页面所在目录（相对输出目录）"""
+    return os.path.join('category', category) if category else ''
+
+def index_url(category='', page=1):
+    """导出页面对应的动态地址"""
+    params = {'page': page, 'page_size': EXPORT_PAGE_SIZE}
+    if category:
+        params['category'] = category
+    return '/?' + urlencode(params)
+
+def static_links(html):
+    """把分页链接 /?page=N&... 改写为同目录下的静态页面"""
+    def replace(match):
+        query = parse_qs(urlsplit(match.group(1).replace('&amp;', '&')).query)
+        page = int(query.get('page', ['1'])[0])
+        return f'href="{page_filename(page)}"'
+    return _PAGE_LINK.sub(replace, html)
+
+def _write(root, relative_path, data):
+    path = os.path.join(root, relative_path)
+    os.makedirs(os.path.dirname(path) or root, exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+def _precompress(root):
+    """为文本文件生成 .gz/.br 版本（与页面缓存相同的最高压缩级别）"""
+    count = 0
+    for directory, _, files in os.walk(root):
+        for name in files:
+            if not name.endswith(PRECOMPRESS_SUFFIXES):
+                continue
+            path = os.path.join(directory, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            if len(data) < MIN_COMPRESS_SIZE:
+                continue
+            for encoding in supported_encodings():
+                suffix = '.br' if encoding == 'br' else '.gz'
+                with open(path + suffix, 'wb') as f:
+                    f.write(compress(data, encoding, CACHED_LEVELS))
+                count += 1
+    return count
+
+def _render(app, endpoint, url):
+    """以匿名请求直接调用视图函数（去掉页面缓存装饰器），返回响应内容"""
+    view = app.view_functions[endpoint]
+    view = getattr(view, '__wrapped__', view)
+    with app.test_request_context(url):
+        response = app.make_response(view())
+    if response.status_code != 200:
+        raise RuntimeError(f"导出 {url} 失败：HTTP {response.status_code}")
+    return response.get_data()
+
+def _total(app, category=''):
+    """该类别（为空时为全部）的可见行数"""
+    params = {'page_size': 1}
+    if category:
+        params['category'] = category
+    return json.loads(_render(app, 'api_indices', '/api/indices?' + urlencode(params)))['total']
+
+def export_site(app, output_dir=EXPORT_DIR):
+    """
+    渲染公开页面并写入 output_dir（先写临时目录，完成后整体替换）
+    返回导出说明 {'pages', 'shards', 'compressed', 'output'}
+    """
+    with _export_lock:
+        staging = output_dir.rstrip(os.sep) + '.tmp'
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        pages = []
+
+        # 首页与各类别页面
+        manifest_pages = {}
+        for category in [''] + CATEGORY_ORDER:
+            total = _total(app, category)
+            if category and not total:
+                continue
+            count = max((total + EXPORT_PAGE_SIZE - 1) // EXPORT_PAGE_SIZE, 1)
+            for page in range(1, count + 1):
+                html = _render(app, 'index', index_url(category, page)).decode('utf-8')
+                relative_path = os.path.join(page_dir(category), page_filename(page))
+                _write(staging, relative_path, static_links(html).encode('utf-8'))
+                pages.append(relative_path)
+            manifest_pages[category or '全部'] = {
+                'path': quote(page_dir(category).replace(os.sep, '/') + '/' if category else ''),
+                'pages': count,
+                'total': total,
+            }
+
+        # 搜索分片：与 /api/indices 的输出相同，前端加载后在本地按名称过滤
+        shards = []
+        shard_count = max((_total(app) + EXPORT_PAGE_SIZE - 1) // EXPORT_PAGE_SIZE, 1)
+        for page in range(1, shard_count + 1):
+            name = f'indices-{page}.json'
+            _write(staging, os.path.join('search', name),
+                   _render(app, 'api_indices', f'/api/indices?page={page}&page_size={EXPORT_PAGE_SIZE}'))
+            shards.append(name)
+        _write(staging, os.path.join('api', 'categories.json'), _render(app, 'api_categories', '/api/categories'))
+
+        from snapshot import load_snapshot
+        snapshot = load_snapshot()
+        manifest = {
+            'version': str(snapshot['mtime']) if snapshot is not None else None,
+            'page_size': EXPORT_PAGE_SIZE,
+            'pages': manifest_pages,
+            'shards': shards,
+        }
+        _write(staging, os.path.join('search', 'manifest.json'),
+               json.dumps(manifest, ensure_ascii=False).encode('utf-8'))
+
+        # 静态资源
+        if app.static_folder and os.path.isdir(app.static_folder):
+            shutil.copytree(app.static_folder, os.path.join(staging, 'static'))
+
+        compressed = _precompress(staging)
+
+        # 整体替换旧的导出目录
+        previous = output_dir.rstrip(os.sep) + '.old'
+        shutil.rmtree(previous, ignore_errors=True)
+        if os.path.exists(output_dir):
+            os.replace(output_dir, previous)
+        os.replace(staging, output_dir)
+        shutil.rmtree(previous, ignore_errors=True)
+
+    print(f"静态站点已导出到 {output_dir}：{len(pages)} 个页面，{len(shards)} 个搜索分片，{compressed} 个预压缩文件")
+    return {'pages': pages, 'shards': shards, 'compressed': compressed, 'output': output_dir}
+
+def verify_export(app, output_dir=EXPORT_DIR):
+    """
+    逐页通过测试客户端请求首页路由（经过页面缓存和请求钩子，与线上访问相同），
+    按相同规则改写链接后与导出文件比较；导出页面每页 EXPORT_PAGE_SIZE 行，请求时带上相同的 page_size
+    返回不一致的页面列表
+    """
+    with open(os.path.join(output_dir, 'search', 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    client = app.test_client()
+    mismatched = []
+    for label, info in manifest['pages'].items():
+        category = '' if label == '全部' else label
+        for page in range(1, info['pages'] + 1):
+            relative_path = os.path.join(page_dir(category), page_filename(page))
+            response = client.get(index_url(category, page), headers={'Accept-Encoding': 'identity'})
+            with open(os.path.join(output_dir, relative_path), encoding='utf-8') as f:
+                exported = f.read()
+            if response.status_code != 200 or exported != static_links(response.get_data(as_text=True)):
+                mismatched.append(relative_path)
+    return mismatched
+
+def _export_worker(app, output_dir):
+    """导出期间又有新快照发布时，完成后再导出一次"""
+    while True:
+        try:
+            export_site(app, output_dir)
+        except Exception as e:
+            print(f"导出静态站点出错: {e}")
+        with _state_lock:
+            if not _state['pending']:
+                _state['running'] = False
+                return
+            _state['pending'] = False
+
+def export_after_publish(app, output_dir=EXPORT_DIR):
+    """
+    快照发布回调：在后台线程导出，不阻塞上传和入库；导出进行中时只记下需要重新导出
+    返回启动的线程（已有导出在进行时返回None）
+    """
+    with _state_lock:
+        if _state['running']:
+            _state['pending'] = True
+            return None
+        _state['running'] = True
+    worker = threading.Thread(target=_export_worker, args=(app, output_dir), name='static-export', daemon=True)
+    worker.start()
+    return worker
+
+def main():
+    parser = argparse.ArgumentParser(description='导出静态站点')
+    parser.add_argument('--output', default=EXPORT_DIR, help='输出目录')
+    parser.add_argument('--check', action='store_true', help='导出后与首页路由的响应逐页比较')
+    args = parser.parse_args()
+
+    from app import app
+    export_site(app, args.output)
+    if args.check:
+        mismatched = verify_export(app, args.output)
+        if mismatched:
+            print(f"以下页面与首页路由的响应不一致: {', '.join(mismatched)}")
+            return 1
+        print("导出页面与首页路由的响应一致")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
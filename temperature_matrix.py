@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+温度矩阵：指数 × 日期 的 float32 稠密矩阵（基金温度），入库时就地更新并用内存映射保存
+热力图接口直接切片，不再逐个读取 processed/ 下的CSV
+
+用法：
+    python temperature_matrix.py --rebuild    # 由 processed/ 下的历史文件重建矩阵
+"""
+import os
+import sys
+import json
+import struct
+import argparse
+import threading
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from export import list_processed_files
+
+# 判断是否在SCF环境
+def is_scf_environment():
+    return 'TENCENTCLOUD_RUNENV' in os.environ
+
+# 数据存储路径处理
+if is_scf_environment():
+    # SCF环境：使用/tmp目录（可写）
+    DATA_DIR = '/tmp/data'
+else:
+    # 本地环境
+    DATA_DIR = 'data'
+
+MATRIX_DIR = os.path.join(DATA_DIR, 'matrix')
+# 初始容量，不够时翻倍
+INITIAL_ROWS = 256
+INITIAL_COLS = 64
+VALUE_COLUMN = '基金温度'
+
+class TemperatureMatrix:
+    """
+    矩阵文件按容量预分配（空位为NaN），元数据记录行名（指数）、列名（日期）、类别和矩阵文件名
+    扩容时写入新文件再切换元数据，读取方按元数据的修改时间判断是否需要重新打开
+    """
+
+    def __init__(self, matrix_dir=MATRIX_DIR):
+        self.matrix_dir = matrix_dir
+        self.meta_file = os.path.join(matrix_dir, 'meta.json')
+        self._lock = threading.Lock()
+        self._version = None
+        self._meta = None
+        self._data = None
+        self._row_index = {}
+        self._col_index = {}
+
+    def version(self):
+        """元数据文件的修改时间，矩阵不存在时返回None"""
+        try:
+            return os.stat(self.meta_file).st_mtime_ns
+        except OSError:
+            return None
+
+    def exists(self):
+        return self.version() is not None
+
+    def _open(self, meta, mode):
+        shape = (meta['capacity_rows'], meta['capacity_cols'])
+        return np.memmap(os.path.join(self.matrix_dir, meta['file']), dtype=np.float32, mode=mode, shape=shape)
+
+    def _load(self, mode='r'):
+        """元数据变化时重新打开矩阵"""
+        version = self.version()
+        if version is None:
+            self._version, self._meta, self._data = None, None, None
+            self._row_index, self._col_index = {}, {}
+            return False
+        if version != self._version or (mode == 'r+' and self._data is not None and not self._data.flags.writeable):
+            with open(self.meta_file, encoding='utf-8') as f:
+                meta = json.load(f)
+            self._data = self._open(meta, mode)
+            self._meta = meta
+            self._version = version
+            self._row_index = {name: i for i, name in enumerate(meta['indices'])}
+            self._col_index = {date: j for j, date in enumerate(meta['dates'])}
+        return True
+
+    def _write_meta(self):
+        tmp_path = self.meta_file + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._meta, f, ensure_ascii=False)
+        os.replace(tmp_path, self.meta_file)
+        self._version = self.version()
+
+    def _create(self, rows, cols, old=None):
+        """按容量新建矩阵文件，复制已有数据，返回新的元数据"""
+        os.makedirs(self.matrix_dir, exist_ok=True)
+        meta = dict(self._meta) if self._meta else {'indices': [], 'categories': [], 'dates': []}
+        meta.update({'capacity_rows': rows, 'capacity_cols': cols, 'file': f'temperature_{rows}x{cols}.f32'})
+        data = self._open(meta, 'w+')
+        data[:] = np.nan
+        if old is not None:
+            n_rows, n_cols = len(meta['indices']), len(meta['dates'])
+            data[:n_rows, :n_cols] = old[:n_rows, :n_cols]
+        data.flush()
+        return meta, data
+
+    def _ensure_capacity(self, rows, cols):
+        capacity_rows = self._meta['capacity_rows'] if self._meta else INITIAL_ROWS
+        capacity_cols = self._meta['capacity_cols'] if self._meta else INITIAL_COLS
+        if self._meta is not None and rows <= capacity_rows and cols <= capacity_cols:
+            return
+        while rows > capacity_rows:
+            capacity_rows *= 2
+        while cols > capacity_cols:
+            capacity_cols *= 2
+        old_file = self._meta['file'] if self._meta else None
+        self._meta, self._data = self._create(capacity_rows, capacity_cols, self._data)
+        self._write_meta()
+        if old_file and old_file != self._meta['file']:
+            try:
+                os.remove(os.path.join(self.matrix_dir, old_file))
+            except OSError:
+                pass
+
+    def update(self, df, file_date):
+        """用某一天的处理结果就地更新该日期所在的列（新指数追加到末尾）"""
+        if not file_date or df is None or '指数名称' not in df.columns or VALUE_COLUMN not in df.columns:
+            return False
+        df = df.drop_duplicates('指数名称')
+        names = df['指数名称'].astype(str).tolist()
+        values = pd.to_numeric(df[VALUE_COLUMN], errors='coerce').to_numpy(dtype=np.float32)
+        categories = df['类别'].astype(str).tolist() if '类别' in df.columns else [''] * len(names)
+
+        with self._lock:
+            self._load('r+')
+            meta = self._meta or {'indices': [], 'categories': [], 'dates': []}
+            new_names = [name for name in names if name not in self._row_index]
+            new_cols = 0 if file_date in self._col_index else 1
+            self._ensure_capacity(len(meta['indices']) + len(new_names), len(meta['dates']) + new_cols)
+
+            for name in new_names:
+                self._row_index[name] = len(self._meta['indices'])
+                self._meta['indices'].append(name)
+                self._meta['categories'].append('')
+            if file_date not in self._col_index:
+                self._col_index[file_date] = len(self._meta['dates'])
+                self._meta['dates'].append(file_date)
+
+            rows = np.fromiter((self._row_index[name] for name in names), dtype=np.intp, count=len(names))
+            col = self._col_index[file_date]
+            self._data[:, col] = np.nan
+            self._data[rows, col] = values
+            # 类别以最新日期的数据为准（新指数总是记录）
+            latest = file_date >= max(self._meta['dates'])
+            for row, category in zip(rows, categories):
+                if latest or not self._meta['categories'][row]:
+                    self._meta['categories'][row] = category
+            self._data.flush()
+            self._write_meta()
+        return True
+
+    def slice(self, date_from=None, date_to=None, category=None):
+        """
+        按日期范围（含两端）和类别切片，范围内没有数据的指数不返回
+        返回 (指数列表, 类别列表, 日期列表, float32矩阵)，日期升序
+        """
+        with self._lock:
+            if not self._load() or not self._meta['dates']:
+                return [], [], [], np.empty((0, 0), dtype=np.float32)
+            meta, data = self._meta, self._data
+            dates = sorted(date for date in meta['dates']
+                           if (not date_from or date >= date_from) and (not date_to or date <= date_to))
+            cols = np.array([self._col_index[date] for date in dates], dtype=np.intp)
+            n_rows = len(meta['indices'])
+            if category:
+                rows = np.array([i for i, c in enumerate(meta['categories'][:n_rows]) if c == category], dtype=np.intp)
+            else:
+                rows = np.arange(n_rows, dtype=np.intp)
+            values = np.asarray(data[np.ix_(rows, cols)], dtype=np.float32)
+            # 去掉范围内没有任何数据的指数
+            has_data = ~np.isnan(values).all(axis=1)
+            rows, values = rows[has_data], values[has_data]
+            indices = [meta['indices'][i] for i in rows]
+            categories = [meta['categories'][i] for i in rows]
+        return indices, categories, dates, values
+
+    def rebuild(self, files=None):
+        """由 processed/ 下的历史文件重建矩阵（只读取需要的三列）"""
+        files = list_processed_files() if files is None else files
+        count = 0
+        for file_date, path in files:
+            try:
+                df = pd.read_csv(path, encoding='utf-8-sig',
+                                 usecols=lambda col: col in ('指数名称', '类别', VALUE_COLUMN))
+            except (OSError, ValueError) as e:
+                print(f"读取 {path} 出错: {e}")
+                continue
+            if self.update(df, file_date):
+                count += 1
+        return count
+
+def encode_json(indices, categories, dates, values):
+    """JSON编码：温度保留一位小数，缺失为null"""
+    rounded = np.round(values.astype(np.float64), 1)
+    rows = [[None if np.isnan(v) else float(v) for v in row] for row in rounded]
+    return json.dumps({'indices': indices, 'categories': categories, 'dates': dates, 'values': rows},
+                      ensure_ascii=False, separators=(',', ':'))
+
+def encode_binary(indices, categories, dates, values):
+    """
+    二进制编码：4字节小端无符号整数 N + N字节UTF-8 JSON头（indices/categories/dates/shape），
+    之后是行优先的小端float32矩阵，缺失为NaN
+    """
+    header = json.dumps({'indices': indices, 'categories': categories, 'dates': dates,
+                         'shape': list(values.shape)}, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return struct.pack('<I', len(header)) + header + np.ascontiguousarray(values, dtype='<f4').tobytes()
+
+temperature_matrix = TemperatureMatrix()
+
+def main():
+    parser = argparse.ArgumentParser(description='温度矩阵维护')
+    parser.add_argument('--rebuild', action='store_true', help='由 processed/ 下的历史文件重建矩阵')
+    args = parser.parse_args()
+    if args.rebuild:
+        count = temperature_matrix.rebuild()
+        print(f"已由 {count} 个历史文件重建温度矩阵")
+    indices, _, dates, _ = temperature_matrix.slice()
+    print(f"温度矩阵：{len(indices)} 个指数 × {len(dates)} 个日期")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+# temperature_models.py
+# 基金温度模型注册表：入库时一次性批量计算所有模型，结果作为快照的附加列保存
+import numpy as np
+import pandas as pd
+from index_categories import industry_mask
+
+DEFAULT_MODEL = 'default'
+
+# 已注册的模型：名称 -> {'label': 显示名, 'func': func(pe, pb, df) -> 温度数组}
+TEMPERATURE_MODELS = {}
+
+def register_model(name, label):
+    """装饰器：注册温度模型，func 接收PE/PB分位点（0-1的ndarray）及整个DataFrame"""
+    def decorator(func):
+        TEMPERATURE_MODELS[name] = {'label': label, 'func': func}
+        return func
+    return decorator
+
+def register_weighted_model(name, label, pe_weights, default_weight=0.5):
+    """注册按类别设置PE权重的模型（PB权重为 1 - PE权重）"""
+    def weighted(pe, pb, df):
+        weight = df['类别'].astype(str).map(pe_weights).fillna(default_weight).to_numpy(dtype=float)
+        return (pe * weight + pb * (1 - weight)) * 100
+    register_model(name, label)(weighted)
+    return weighted
+
+def model_column(name):
+    """模型结果在快照中的列名"""
+    return '基金温度' if name == DEFAULT_MODEL else f'基金温度_{name}'
+
+def parse_quantile(series):
+    """
+    整列解析分位点为0-1的小数：
+    '=0.8210' -> 0.821，'82.10%' -> 0.821，数值大于1的按百分数处理，空值/'-'/无法解析的为0
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        num = series.to_numpy(dtype=float)
+        num = np.where(num > 1, num / 100, num)
+    else:
+        text = series.astype(str).str.replace(r'^=', '', regex=True)
+        has_percent = text.str.contains('%', regex=False).to_numpy()
+        num = pd.to_numeric(text.str.replace('%', '', regex=False), errors='coerce').to_numpy(dtype=float)
+        num = np.where(has_percent, num / 100, num)
+        num[series.isna().to_numpy()] = 0
+    return np.nan_to_num(num, nan=0.0)
+
+@register_model(DEFAULT_MODEL, '默认（行业看PB，其余PE/PB均值）')
+def default_model(pe, pb, df):
+    return np.where(industry_mask(df['指数名称']), pb * 100, (pe + pb) / 2 * 100)
+
+@register_model('pe', '仅PE分位点')
+def pe_model(pe, pb, df):
+    return pe * 100
+
+@register_model('pb', '仅PB分位点')
+def pb_model(pe, pb, df):
+    return pb * 100
+
+# 按类别调整PE权重：行业指数盈利波动大，以PB为主；海外指数以PE为主
+register_weighted_model('category', '按类别加权', {
+    '大盘': 0.5,
+    '小盘': 0.5,
+    '策略': 0.5,
+    '行业': 0.0,
+    '主题': 0.3,
+    '海外': 0.7,
+    '其他': 0.5,
+})
+
+def compute_temperatures(df):
+    """
+    一次性计算所有已注册模型的基金温度，写入 基金温度 / 基金温度_<模型名> 列
+    需要 PE分位点、PB分位点、指数名称、类别 列
+    """
+    pe = parse_quantile(df['PE分位点'])
+    pb = parse_quantile(df['PB分位点'])
+    df['PE分位点数值'] = pe
+    df['PB分位点数值'] = pb
+    for name, model in TEMPERATURE_MODELS.items():
+        df[model_column(name)] = np.round(np.asarray(model['func'](pe, pb, df), dtype=float), 1)
+    return df
+
+def resolve_model(name, columns):
+    """校验 ?model= 参数，返回 (模型名, 列名)；未知模型或快照中没有该列时回退到默认模型"""
+    if name in TEMPERATURE_MODELS and model_column(name) in columns:
+        return name, model_column(name)
+    return DEFAULT_MODEL, model_column(DEFAULT_MODEL)
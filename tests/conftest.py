@@ -0,0 +1,47 @@
+# tests/conftest.py
+# 各模块的数据目录都是相对路径 data，测试在临时目录中运行，互不影响也不污染仓库
+import os
+import sys
+import tempfile
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """切换到临时目录并创建上传目录，清空进程内已识别的CSV格式"""
+    from schemas import schema_registry
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(schema_registry, '_schemas', None)
+    os.makedirs(tmp_path / 'data' / 'uploaded')
+    return tmp_path
+
+def write_csv(directory, name, text):
+    path = directory / name
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+# 仓库中没有页面模板，首页用只输出表格的模板渲染
+TEMPLATE_DIR = tempfile.mkdtemp(prefix='fund-templates-')
+with open(os.path.join(TEMPLATE_DIR, 'index.html'), 'w', encoding='utf-8') as f:
+    f.write('{{ data_table|safe }}')
+
+@pytest.fixture
+def app(workdir):
+    """Flask应用：清空进程内的快照和页面缓存，使用测试模板"""
+    import app as app_module
+    import snapshot
+    app_module.app.template_folder = TEMPLATE_DIR
+    app_module.app.config['TESTING'] = True
+    app_module.page_cache.clear()
+    snapshot._cache = None
+    return app_module.app
+
+def ingest_csv(directory, text, date='2025-12-24'):
+    """把CSV放入上传目录并入库发布为当前快照"""
+    from ingest_watcher import ingest_file
+    path = write_csv(directory / 'data' / 'uploaded', f'{date}.csv', text)
+    assert ingest_file(path, chunked=False) is not None
+    return path
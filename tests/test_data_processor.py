@@ -0,0 +1,60 @@
+# tests/test_data_processor.py
+import pytest
+from conftest import write_csv
+from data_processor import process_lixingren_csv, get_advice
+
+# 分位点写作普通数字：大于1的按百分数处理（2.83 即 2.83%）
+PLAIN_CSV = '''指数名称,PE-TTM(分位点%),PB(分位点%),今年以来涨跌幅,涨跌幅,关注度
+中证白酒,45.2,2.83,0.12,-0.01,"12,000"
+沪深300,30.5,40.1,0.05,0.002,500
+中证500,0.45,0.3,-0.1,0.01,800
+'''
+
+# 同一列中混有 '='、'%' 和普通数字
+MIXED_CSV = '''指数名称,PE-TTM(分位点%),PB(分位点%),今年以来涨跌幅,涨跌幅,关注度
+中证白酒,=45.2%,2.83,0.12,-0.01,"12,000"
+沪深300,30.5,=0.401,5%,0.002,500
+中证500,0.45,0.3,abc,,800
+恒生医疗,-,88,-0.1,=0.5,-
+'''
+
+@pytest.mark.parametrize('chunksize', [None, 1, 2, 5000])
+def test_plain_numeric_quantiles(workdir, chunksize):
+    df = process_lixingren_csv(write_csv(workdir, 'plain.csv', PLAIN_CSV), chunksize=chunksize)
+    temperatures = dict(zip(df['指数名称'], df['基金温度']))
+    assert temperatures == {'中证白酒': 2.8, '沪深300': 35.3, '中证500': 37.5}
+    assert df['投资建议'].tolist() == [get_advice(t) for t in df['基金温度']]
+
+@pytest.mark.parametrize('chunksize', [1, 2, 3])
+def test_chunked_matches_whole_file(workdir, chunksize):
+    path = write_csv(workdir, 'mixed.csv', MIXED_CSV)
+    whole = process_lixingren_csv(path)
+    chunked = process_lixingren_csv(path, chunksize=chunksize)
+    # 数据更新时间是处理时刻，不参与比较
+    chunked, whole = chunked.drop(columns='数据更新时间'), whole.drop(columns='数据更新时间')
+    assert chunked.astype(str).values.tolist() == whole.astype(str).values.tolist()
+
+def test_header_with_spaces(workdir):
+    header, body = PLAIN_CSV.split('\n', 1)
+    path = write_csv(workdir, 'spaced.csv', header.replace(',', ', ') + '\n' + body)
+    df = process_lixingren_csv(path)
+    assert dict(zip(df['指数名称'], df['基金温度'])) == {'中证白酒': 2.8, '沪深300': 35.3, '中证500': 37.5}
+
+def test_schema_dtypes_recorded_once(workdir):
+    import json
+    from schemas import SCHEMA_FILE
+    process_lixingren_csv(write_csv(workdir, 'plain.csv', PLAIN_CSV))
+    with open(SCHEMA_FILE, encoding='utf-8') as f:
+        (schema,) = json.load(f).values()
+    assert schema['dtypes'] == {'PE-TTM(分位点%)': 'float64', 'PB(分位点%)': 'float64', '今年以来涨跌幅': 'float64',
+                                '涨跌幅': 'float64', '关注度': 'str'}
+
+    # 同一格式的文件出现非数字内容时，按该文件重新判断列类型并记录
+    path = write_csv(workdir, 'mixed.csv', MIXED_CSV)
+    df = process_lixingren_csv(path)
+    with open(SCHEMA_FILE, encoding='utf-8') as f:
+        (schema,) = json.load(f).values()
+    assert schema['dtypes']['PE-TTM(分位点%)'] == 'str'
+    assert schema['dtypes']['涨跌幅'] == 'str'
+    assert df.drop(columns='数据更新时间').astype(str).values.tolist() == \
+        process_lixingren_csv(path).drop(columns='数据更新时间').astype(str).values.tolist()
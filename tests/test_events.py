@@ -0,0 +1,45 @@
+# tests/test_events.py
+from conftest import ingest_csv
+from test_data_processor import PLAIN_CSV
+from events import snapshot_events
+
+def test_events_counts_subscribers_until_closed(app, workdir, monkeypatch):
+    import app as app_module
+    ingest_csv(workdir, PLAIN_CSV)
+    client = app.test_client()
+    before = snapshot_events.subscribers
+
+    response = client.get('/events', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    assert snapshot_events.subscribers == before + 1
+    stream = response.response
+    assert next(stream) == b'retry: 5000\n\n'
+    assert b'event: snapshot' in next(stream)
+    response.close()
+    assert snapshot_events.subscribers == before
+
+    # 未开始发送就关闭的连接同样释放计数
+    client.get('/events', buffered=False).close()
+    assert snapshot_events.subscribers == before
+
+    monkeypatch.setattr(app_module, 'MAX_EVENT_SUBSCRIBERS', before)
+    assert client.get('/events').status_code == 503
+
+def test_poller_stops_without_subscribers(workdir):
+    from events import SnapshotEvents
+    events = SnapshotEvents(poll_interval=0.01)
+    events.subscribe()
+    poller = events._poller
+    assert poller.is_alive()
+    events.unsubscribe()
+    poller.join(5)
+    assert not poller.is_alive()
+    assert events._poller is None
+
+    # 再次订阅时重新启动
+    events.subscribe()
+    restarted = events._poller
+    assert restarted is not None and restarted is not poller and restarted.is_alive()
+    events.unsubscribe()
+    restarted.join(5)
+    assert not restarted.is_alive()
@@ -0,0 +1,226 @@
+# tests/test_index_render.py
+# 首页表格与原来逐个单元格格式化（clean_value/to_percentage/format_temperature/generate_custom_html_table）的输出比较
+import re
+from urllib.parse import urlsplit, parse_qs
+import numpy as np
+import pandas as pd
+import pytest
+from flask import request
+from conftest import ingest_csv
+from test_data_processor import PLAIN_CSV
+
+QUANTILES = ['0.9', '35.5%', '=0.4', '55%', '88', '0.7', '=0.3', '0.1', '12', '-', '0', '', '=45.2%', 'abc']
+CHANGES = ['100', '12.5%', 'abc', '-3.2%', '1.5', '=-0.00001', '==0.5', '0.0049999', '-0.5', '0',
+           '=12.345', '', '=1=2', ' 2.5 ', '-', '1e-3']
+ATTENTIONS = ['"9,999"', '"=12,345"', '"=1=0,000"', '0', '', 'abc', '15000', '-', '"10,001"', '800']
+NAMES = ['中证指数', '恒生医疗', '中证白酒', '沪深300', '标普500']
+
+def edge_csv(rows=60, attentions=ATTENTIONS):
+    """各列混有 '='、'%'、普通数字、'-'、空值和无法解析的内容"""
+    lines = ['指数名称,PE-TTM(分位点%),PB(分位点%),今年以来涨跌幅,涨跌幅,关注度']
+    for i in range(rows):
+        lines.append(','.join([
+            f'{NAMES[i % len(NAMES)]}{i}',
+            QUANTILES[i % len(QUANTILES)],
+            QUANTILES[(i * 5 + 3) % len(QUANTILES)],
+            CHANGES[(i * 3) % len(CHANGES)],
+            CHANGES[(i * 7 + 1) % len(CHANGES)],
+            attentions[(i * 3 + 1) % len(attentions)],
+        ]))
+    return '\n'.join(lines) + '\n'
+
+# ---------- 原来的逐个单元格格式化 ----------
+def clean_value(value):
+    if isinstance(value, str):
+        if value.startswith('='):
+            return value[1:]
+        return value.replace('=', '')
+    return value
+
+def to_percentage(value):
+    if value == '-' or pd.isna(value):
+        return '-'
+    try:
+        if isinstance(value, str):
+            if '%' in value:
+                return value
+            num = float(value)
+        else:
+            num = float(value)
+        if num > 1:
+            return f"{num:.2f}%"
+        else:
+            return f"{(num * 100):.2f}%"
+    except:
+        return value
+
+def format_temperature(temp):
+    if temp < 30:
+        color, icon = "success", "❄️"
+    elif temp < 50:
+        color, icon = "info", "🌤️"
+    elif temp < 70:
+        color, icon = "warning", "🔥"
+    else:
+        color, icon = "danger", "☀️"
+    return f'<span class="badge bg-{color}">{icon} {temp:.1f}°C</span>'
+
+def generate_custom_html_table(df):
+    html = '<table class="table table-striped table-hover table-bordered">'
+    html += '<thead><tr>'
+    for col in df.columns:
+        html += f'<th>{col}</th>'
+    html += '</tr></thead>'
+    html += '<tbody>'
+    for _, row in df.iterrows():
+        html += '<tr>'
+        for col in df.columns:
+            value = row[col]
+            if col in ['今年涨跌', '昨涨跌'] and isinstance(value, str) and value != '-':
+                try:
+                    num = float(value.replace('%', ''))
+                    if num < 0:
+                        html += f'<td style="color: green;">{value}</td>'
+                    else:
+                        html += f'<td style="color: red;">{value}</td>'
+                except:
+                    html += f'<td>{value}</td>'
+            elif col == '关注度' and value != '-':
+                try:
+                    if isinstance(value, str):
+                        num = float(value.replace(',', ''))
+                    else:
+                        num = float(value)
+                    if num > 10000:
+                        html += f'<td style="color: red;">{value}</td>'
+                    else:
+                        html += f'<td>{value}</td>'
+                except:
+                    html += f'<td>{value}</td>'
+            elif col == '投资建议' and value != '-':
+                if '低估' in value:
+                    html += f'<td style="color: #28a745;">{value}</td>'
+                elif '正常偏低' in value:
+                    html += f'<td style="color: #17a2b8;">{value}</td>'
+                elif '正常偏高' in value:
+                    html += f'<td style="color: #ffc107;">{value}</td>'
+                elif '高估' in value:
+                    html += f'<td style="color: #dc3545;">{value}</td>'
+                else:
+                    html += f'<td>{value}</td>'
+            else:
+                html += f'<td>{value}</td>'
+        html += '</tr>'
+    html += '</tbody></table>'
+    return html
+
+def legacy_table(df, start):
+    df = df.copy()
+    df['基金温度'] = df['基金温度'].round(1).apply(format_temperature)
+    for col in ['今年以来涨跌幅', '涨跌幅', '关注度']:
+        if col not in df.columns:
+            df[col] = '-'
+    df = df.rename(columns={'今年以来涨跌幅': '今年涨跌', '涨跌幅': '昨涨跌'})
+    for col in ['今年涨跌', '昨涨跌', '关注度']:
+        df[col] = df[col].apply(clean_value)
+    for col in ['今年涨跌', '昨涨跌']:
+        df[col] = df[col].apply(to_percentage)
+    df['序号'] = range(start + 1, start + len(df) + 1)
+    columns = ['序号', '类别', '指数名称', '基金温度', '今年涨跌', '昨涨跌', '关注度', '投资建议']
+    return generate_custom_html_table(df[[col for col in columns if col in df.columns]])
+
+def expected_table(app, query):
+    """按首页相同的行和顺序，用原来的格式化函数生成表格"""
+    import app as app_module
+    from snapshot import load_snapshot, ordered_positions
+    from temperature_models import DEFAULT_MODEL, resolve_model
+    with app.test_request_context('/' + query):
+        snapshot = load_snapshot()
+        df = snapshot['df']
+        model, temperature_column = resolve_model(DEFAULT_MODEL, df.columns)
+        keep = app_module.visible_rows(snapshot, temperature_column, request.args.get('search', '').strip(),
+                                       request.args.get('category', '').strip())
+        sort, order, page, page_size = app_module.parse_paging_args(request.args)
+        positions = ordered_positions(snapshot, sort, order, keep=np.flatnonzero(keep), model=model)
+        start = (page - 1) * page_size
+        return legacy_table(df.iloc[positions[start:start + page_size]], start)
+
+QUERIES = ['', '?page=2&page_size=7', '?page_size=500', '?sort=temperature&order=asc', '?sort=ytd',
+           '?sort=change&order=asc&page_size=500', '?sort=attention&order=asc', '?search=中证',
+           '?search=白酒', '?category=行业', '?sort=name&order=asc&page_size=500']
+
+@pytest.mark.parametrize('dataset', ['edge', 'plain'])
+def test_index_matches_legacy_formatter(app, workdir, dataset):
+    ingest_csv(workdir, edge_csv() if dataset == 'edge' else PLAIN_CSV)
+    client = app.test_client()
+    for query in QUERIES:
+        html = client.get('/' + query).get_data(as_text=True)
+        if '未找到包含' in html:
+            continue
+        table = html[:html.index('</table>') + len('</table>')]
+        assert table == expected_table(app, query), query
+
+def test_index_search_without_match(app, workdir):
+    ingest_csv(workdir, edge_csv())
+    html = app.test_client().get('/?search=zzz').get_data(as_text=True)
+    assert html == '<div class="alert alert-info">未找到包含 "zzz" 的指数。</div>'
+
+def test_pagination_links_keep_only_index_args(app, workdir):
+    ingest_csv(workdir, edge_csv())
+    client = app.test_client()
+    response = client.get('/?page_size=1&category=行业&_scheme=x&_external=1&_anchor=top&_method=POST&next=evil')
+    assert response.status_code == 200
+    html = response.get_data(as_text=True)
+    links = re.findall(r'href="([^"]*)"', html[html.index('<nav>'):])
+    assert links and all(link.startswith('/?page=') for link in links)
+    assert all(parse_qs(urlsplit(link).query).keys() == {'page', 'page_size', 'category'} for link in links)
+    assert '读取数据出错' not in client.get('/?_scheme=x').get_data(as_text=True)
+
+# 原来的首页在关注度无法转为数字时直接报错，按原来的过滤与排序比较时只用它能渲染的关注度
+RENDERABLE_ATTENTIONS = ['"9,999"', '"=12,345"', '0', '', '15000', '-', '"10,001"', '800']
+
+def legacy_index_names(data_file):
+    """
+    按原来首页的过滤与排序得到要展示的指数名称：
+    今年涨跌/昨涨跌/关注度不为'-'、分位点有效、温度徽章不为0.0°C，
+    再按关注度数值降序、类别排序升序、基金温度降序排序
+    （类别与基金温度取快照中的值，分类和温度模型的变化不在这里比较；原来排序时基金温度已经是徽章HTML，
+    按字符串比较实际是按颜色类名排序，首页改为按温度数值排序，这里也按格式化前的数值排序）
+    """
+    df = pd.read_csv(data_file, encoding='utf-8-sig')
+    temperature = df['基金温度'].round(1)
+    df['基金温度'] = temperature.apply(format_temperature)
+    df = df.rename(columns={'今年以来涨跌幅': '今年涨跌', '涨跌幅': '昨涨跌'})
+    for col in ['今年涨跌', '昨涨跌', '关注度']:
+        df[col] = df[col].apply(clean_value)
+    for col in ['今年涨跌', '昨涨跌']:
+        df[col] = df[col].apply(to_percentage)
+
+    valid_rows = (df['今年涨跌'] != '-') & (df['昨涨跌'] != '-') & (df['关注度'] != '-')
+    df = df[valid_rows]
+    valid_quantiles = (df['PE分位点'] != '-') & (df['PB分位点'] != '-')
+    valid_quantiles &= ~pd.isna(df['PE分位点']) & ~pd.isna(df['PB分位点'])
+    valid_quantiles &= (df['PE分位点'] != '0') & (df['PE分位点'] != '0%')
+    valid_quantiles &= (df['PB分位点'] != '0') & (df['PB分位点'] != '0%')
+    if pd.api.types.is_numeric_dtype(df['PE分位点']) and pd.api.types.is_numeric_dtype(df['PB分位点']):
+        valid_quantiles &= (df['PE分位点'] != 0) & (df['PB分位点'] != 0)
+    df = df[valid_quantiles]
+    df = df[(df['基金温度'] != '<span class="badge bg-success">❄️ 0.0°C</span>') & (df['基金温度'] != '-')]
+
+    df['关注度数值'] = df['关注度'].apply(lambda x: float(x.replace(',', '')) if isinstance(x, str) and x != '-' else 0)
+    category_order = ['大盘', '小盘', '策略', '行业', '主题', '海外', '其他']
+    df['类别排序'] = df['类别'].map({cat: idx for idx, cat in enumerate(category_order)})
+    df['温度数值'] = temperature
+    df = df.sort_values(by=['关注度数值', '类别排序', '温度数值'], ascending=[False, True, False])
+    return df['指数名称'].tolist()
+
+@pytest.mark.parametrize('dataset', ['edge', 'plain'])
+def test_index_rows_match_legacy_filters(app, workdir, dataset):
+    from app import MAX_PAGE_SIZE
+    from snapshot import SNAPSHOT_FILE
+    ingest_csv(workdir, edge_csv(attentions=RENDERABLE_ATTENTIONS) if dataset == 'edge' else PLAIN_CSV)
+    html = app.test_client().get(f'/?page_size={MAX_PAGE_SIZE}').get_data(as_text=True)
+    names = re.findall(r'<tr><td>\d+</td><td>[^<]*</td><td>([^<]*)</td>', html)
+    expected = legacy_index_names(SNAPSHOT_FILE)
+    assert 0 < len(expected) < MAX_PAGE_SIZE
+    assert names == expected
@@ -0,0 +1,43 @@
+# tests/test_ingest_watcher.py
+import os
+import time
+from datetime import datetime
+from conftest import write_csv
+from test_data_processor import PLAIN_CSV
+from ingest_watcher import UploadWatcher, ingest_file, list_uploads, needs_processing
+from snapshot import load_snapshot
+
+def _set_mtime(path, date):
+    timestamp = time.mktime(datetime.strptime(date, '%Y-%m-%d').replace(hour=12).timetuple())
+    os.utime(path, (timestamp, timestamp))
+
+def test_undated_upload_uses_modification_date(workdir):
+    upload_dir = workdir / 'data' / 'uploaded'
+    dated = write_csv(upload_dir, '2025-12-20.csv', PLAIN_CSV)
+    undated = write_csv(upload_dir, 'vendor_export.csv', PLAIN_CSV.replace('中证白酒', '中证酒'))
+    _set_mtime(dated, '2025-12-20')
+    _set_mtime(undated, '2025-12-24')
+
+    assert needs_processing(undated)
+    # 按日期而不是文件名判断最新的文件
+    assert list_uploads(str(upload_dir))[0] == undated
+
+    watcher = UploadWatcher(str(upload_dir))
+    assert watcher.scan(settle=False) == 2
+    assert os.path.exists(os.path.join('data', 'processed', 'processed_2025-12-24.csv'))
+    assert not needs_processing(undated)
+    assert '中证酒' in set(load_snapshot()['df']['指数名称'])
+    # 没有变化时不再处理
+    assert watcher.scan(settle=False) == 0
+
+def test_older_file_does_not_replace_newer_snapshot(workdir):
+    upload_dir = workdir / 'data' / 'uploaded'
+    newer = write_csv(upload_dir, '2025-12-24.csv', PLAIN_CSV)
+    older = write_csv(upload_dir, '2025-12-20.csv', PLAIN_CSV.replace('中证白酒', '中证酒'))
+    # 两个处理线程中较旧的文件后完成
+    assert ingest_file(newer) is not None
+    assert ingest_file(older) is not None
+    assert os.path.exists(os.path.join('data', 'processed', 'processed_2025-12-20.csv'))
+    snapshot = load_snapshot()
+    assert snapshot['summary']['data_date'] == '2025-12-24'
+    assert '中证白酒' in set(snapshot['df']['指数名称'])
@@ -0,0 +1,61 @@
+# tests/test_memory_guard.py
+import memory_guard
+
+def test_relieve_after_request_is_rate_limited(monkeypatch):
+    calls = []
+    monkeypatch.setattr(memory_guard, '_pressure_handlers', [lambda: calls.append(1)])
+    monkeypatch.setattr(memory_guard, '_last_relief', 0.0)
+    monkeypatch.setattr(memory_guard, 'MEMORY_BUDGET_MB', 100.0)
+    clock = [1000.0]
+    monkeypatch.setattr(memory_guard.time, 'monotonic', lambda: clock[0])
+
+    # 未超预算、或本次请求没有使内存增长：不释放
+    assert memory_guard.relieve_after_request(90, 95) is None
+    assert memory_guard.relieve_after_request(120, 120) is None
+    assert memory_guard.relieve_after_request(125, 120) is None
+    assert calls == []
+
+    assert memory_guard.relieve_after_request(110, 120) is not None
+    assert calls == [1]
+    # 间隔内不再释放
+    clock[0] += memory_guard.RELIEVE_INTERVAL - 1
+    assert memory_guard.relieve_after_request(110, 120) is None
+    assert calls == [1]
+    clock[0] += 1
+    assert memory_guard.relieve_after_request(110, 120) is not None
+    assert calls == [1, 1]
+
+def test_plan_ingest_uses_chunked_estimate(monkeypatch):
+    monkeypatch.setattr(memory_guard, '_pressure_handlers', [])
+    monkeypatch.setattr(memory_guard, 'current_rss_mb', lambda: 60.0)
+    monkeypatch.setattr(memory_guard, 'MEMORY_BUDGET_MB', 100.0)
+    mb = 1024 * 1024
+    assert memory_guard.plan_ingest(2 * mb) == 'normal'
+    assert memory_guard.plan_ingest(2.5 * mb) == 'chunked'
+    assert memory_guard.plan_ingest(3 * mb) == 'reject'
+
+def test_upload_rejected_before_body_is_read(app, monkeypatch):
+    import io
+    import app as app_module
+
+    class Unreadable(io.RawIOBase):
+        def readable(self):
+            return True
+
+        def seekable(self):
+            return True
+
+        def seek(self, offset, whence=io.SEEK_SET):
+            return 0
+
+        def readinto(self, buffer):
+            raise AssertionError('请求体不应被读取')
+
+    monkeypatch.setattr(app_module, 'plan_ingest', lambda size: 'reject')
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['logged_in'] = True
+    response = client.post('/upload', input_stream=Unreadable(), content_length=1024 * 1024,
+                           content_type='multipart/form-data; boundary=x')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(memory_guard.RETRY_AFTER_SECONDS)
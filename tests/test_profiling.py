@@ -0,0 +1,33 @@
+# tests/test_profiling.py
+import cProfile
+import pstats
+import pytest
+from data_processor import process_lixingren_csv
+from profiling import pandas_breakdown
+from test_data_processor import PLAIN_CSV, MIXED_CSV
+from conftest import write_csv
+
+@pytest.mark.parametrize('chunksize', [None, 1])
+def test_breakdown_includes_read_csv(workdir, chunksize):
+    path = write_csv(workdir, 'plain.csv', PLAIN_CSV)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    process_lixingren_csv(path, chunksize=chunksize)
+    profiler.disable()
+    names = [row[0] for row in pandas_breakdown(pstats.Stats(profiler))]
+    assert any(name.endswith('(read_csv)') for name in names)
+    assert any(name.endswith('(sort_values)') for name in names)
+
+def test_breakdown_follows_call_graph(workdir):
+    path = write_csv(workdir, 'mixed.csv', MIXED_CSV)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    process_lixingren_csv(path)
+    profiler.disable()
+    names = [row[0] for row in pandas_breakdown(pstats.Stats(profiler))]
+    # classify_indices 与 compute_temperatures/parse_quantile 中的pandas调用
+    assert any(name.endswith('(factorize)') for name in names)
+    assert any(name.endswith('(from_codes)') for name in names)
+    assert any(name.endswith('(to_numeric)') for name in names)
+    # pandas内部调用的pandas函数不单独列出
+    assert not any(name.endswith('(_read)') for name in names)
@@ -0,0 +1,29 @@
+# tests/test_snapshot.py
+import os
+import pytest
+import snapshot
+from snapshot import publish_snapshot, load_snapshot, SNAPSHOT_FILE
+from data_processor import process_lixingren_csv
+from test_data_processor import PLAIN_CSV
+from conftest import write_csv
+
+def test_loaded_snapshot_survives_republish(workdir):
+    df = process_lixingren_csv(write_csv(workdir, 'plain.csv', PLAIN_CSV))
+    publish_snapshot(df)
+    first = load_snapshot()
+    first_mtime, first_df = first['mtime'], first['df']
+
+    publish_snapshot(df.head(1))
+    # 保证修改时间不同（文件系统时间精度较粗时）
+    os.utime(SNAPSHOT_FILE, ns=(first_mtime + 1, first_mtime + 1))
+    second = load_snapshot()
+
+    assert second is not first
+    assert len(second['df']) == 1
+    # 先取得的快照不受后续发布和加载影响
+    assert first['mtime'] == first_mtime
+    assert first['df'] is first_df and len(first_df) == 3
+    assert set(first) == {'mtime', 'df', 'summary', 'sort'}
+    with pytest.raises(TypeError):
+        first['df'] = None
+    assert snapshot.load_snapshot() is second
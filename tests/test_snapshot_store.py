@@ -0,0 +1,53 @@
+# tests/test_snapshot_store.py
+import os
+import pytest
+import snapshot
+import snapshot_store
+from snapshot_store import SnapshotStore, LocalDirStore, pull_snapshot, local_version
+from temperature_matrix import temperature_matrix
+from conftest import ingest_csv
+from test_data_processor import PLAIN_CSV
+
+def test_store_interface_is_abstract():
+    with pytest.raises(TypeError):
+        SnapshotStore()
+
+    class Incomplete(SnapshotStore):
+        def latest_version(self):
+            return None
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+def test_pull_notifies_listeners_and_updates_matrix(workdir, monkeypatch):
+    store = LocalDirStore(str(workdir / 'store'))
+    monkeypatch.setattr(snapshot_store, 'store', store)
+    monkeypatch.setattr(snapshot, '_cache', None)
+
+    # 实例A：入库发布，发布回调把快照上传到存储
+    publisher = workdir / 'a'
+    os.makedirs(publisher / 'data' / 'uploaded')
+    monkeypatch.chdir(publisher)
+    ingest_csv(publisher, PLAIN_CSV, date='2025-12-24')
+    version = store.latest_version()
+    assert version == local_version()
+
+    # 实例B：从存储拉取
+    received = []
+    monkeypatch.setattr(snapshot, '_publish_listeners',
+                        snapshot._publish_listeners + [lambda df, mtime: received.append((len(df), mtime))])
+    subscriber = workdir / 'b'
+    os.makedirs(subscriber)
+    monkeypatch.chdir(subscriber)
+    monkeypatch.setattr(snapshot, '_cache', None)
+    assert pull_snapshot()
+
+    assert local_version() == version
+    assert received == [(3, version)]
+    indices, _, dates, values = temperature_matrix.slice()
+    assert dates == ['2025-12-24']
+    assert dict(zip(indices, values[:, 0].tolist())) == pytest.approx({'中证白酒': 2.8, '沪深300': 35.3, '中证500': 37.5})
+    # 拉取到的版本不会再被上传
+    assert store.latest_version() == version
+    assert sorted(os.listdir(workdir / 'store')) == sorted(['LATEST', str(version)])
+    assert not pull_snapshot()
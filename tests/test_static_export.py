@@ -0,0 +1,41 @@
+# tests/test_static_export.py
+import os
+import json
+from conftest import ingest_csv
+from test_index_render import edge_csv
+from static_export import export_site, verify_export, export_after_publish, EXPORT_PAGE_SIZE
+
+def test_export_matches_index(app, workdir):
+    import app as app_module
+    ingest_csv(workdir, edge_csv(1200))
+    output = str(workdir / 'site')
+    result = export_site(app, output)
+    # 导出不经过页面缓存
+    assert not app_module.page_cache._pages
+    # 导出页面每页 EXPORT_PAGE_SIZE=500 行（动态首页 / 默认每页50行），逐页与 /?page=N&page_size=500 的响应比较
+    assert verify_export(app, output) == []
+    # 多页：1200行中可见的行超过一页
+    assert 'page-2.html' in result['pages']
+    with open(os.path.join(output, 'search', 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    assert manifest['shards'] == result['shards']
+    assert manifest['page_size'] == EXPORT_PAGE_SIZE != app_module.DEFAULT_PAGE_SIZE
+
+def test_export_detects_stale_page(app, workdir):
+    ingest_csv(workdir, edge_csv())
+    output = str(workdir / 'site')
+    export_site(app, output)
+    with open(os.path.join(output, 'index.html'), 'a', encoding='utf-8') as f:
+        f.write('<!-- stale -->')
+    assert verify_export(app, output) == ['index.html']
+
+def test_publish_does_not_export_by_default(app, workdir):
+    ingest_csv(workdir, edge_csv())
+    assert not os.path.exists(os.path.join('data', 'site'))
+
+def test_export_after_publish_runs_in_background(app, workdir):
+    ingest_csv(workdir, edge_csv())
+    output = str(workdir / 'site')
+    worker = export_after_publish(app, output)
+    worker.join(30)
+    assert verify_export(app, output) == []